@@ -1,5 +1,8 @@
 from flask import Flask, request, jsonify
-from dbconn import create_connection, close_connection
+import mysql.connector
+from dbconn import get_db, get_cursor, init_app as init_db, pool_stats
+from jwt_auth import init_app as init_auth, roles_required
+from json_provider import FastJSONProvider
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask_cors import CORS
@@ -8,9 +11,17 @@ import calendar
 from calendar import month_name
 from auth import auth_bp
 from notify import notify_bp
-from dashboard import dashboard_bp
+from dashboard import dashboard_bp, invalidate_dashboard_statistics
+from export import export_bp
+from instrumentation import metrics_bp, init_app as init_instrumentation
+from prometheus import prometheus_bp, init_app as init_prometheus
+from slow_queries import slow_queries_bp, init_app as init_slow_queries
+from profiler import profiler_bp, init_app as init_profiler
+import csv
+import io
 import json
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,13 +30,71 @@ load_dotenv()
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.register_blueprint(auth_bp)
 app.register_blueprint(notify_bp)
 app.register_blueprint(dashboard_bp)
+app.register_blueprint(export_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(prometheus_bp)
+app.register_blueprint(slow_queries_bp)
+app.register_blueprint(profiler_bp)
+init_db(app)
+init_instrumentation(app)
+init_prometheus(app)
+init_slow_queries(app)
+init_auth(app)
+init_profiler(app)
 CORS(app, resources={r"/*": {"origins": "*"}}) 
 
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", 'y&f9Mv$e!zR3P@bE#tKqU1Xc4gL*oN7a')
 
+# Rows per multi-row INSERT statement for bulk writes
+ATTENDANCE_CHUNK_SIZE = int(os.getenv('ATTENDANCE_CHUNK_SIZE', 1000))
+ATTENDANCE_STATUSES = ('present', 'absent', 'late')
+
+
+# Student listing
+STUDENT_FIELDS = ('student_id', 'full_name', 'date_of_birth', 'gender', 'email', 'phone', 'address',
+                  'grade', 'fee_status', 'total_fee', 'status', 'enrollment_date')
+STUDENT_DEFAULT_FIELDS = ['student_id', 'full_name', 'grade', 'gender', 'fee_status', 'status']
+STUDENTS_PAGE_SIZE = int(os.getenv('STUDENTS_PAGE_SIZE', 100))
+STUDENTS_MAX_PAGE_SIZE = int(os.getenv('STUDENTS_MAX_PAGE_SIZE', 1000))
+
+# Bulk student import
+STUDENT_IMPORT_CHUNK_SIZE = int(os.getenv('STUDENT_IMPORT_CHUNK_SIZE', 1000))
+STUDENT_IMPORT_MAX_ERRORS = 1000
+STUDENT_IMPORT_COLUMNS = ('full_name', 'date_of_birth', 'gender', 'email', 'phone', 'address',
+                          'grade', 'fee_status', 'total_fee', 'status')
+STUDENT_GENDERS = ('Male', 'Female', 'Other')
+STUDENT_FEE_STATUSES = ('pending', 'completed')
+STUDENT_STATUSES = ('active', 'deactive')
+# Import fields stored as text; JSON numbers (e.g. a numeric grade) are accepted
+STUDENT_IMPORT_TEXT_FIELDS = ('full_name', 'first_name', 'last_name', 'date_of_birth', 'gender', 'email',
+                              'phone', 'address', 'grade', 'fee_status', 'status')
+
+# Fee collection report transaction pages
+FEE_TRANSACTIONS_PAGE_SIZE = 100
+FEE_TRANSACTIONS_MAX_PAGE_SIZE = 1000
+
+# Student search (FULLTEXT ngram index, see migrations/003)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_NGRAM_TOKEN_SIZE = int(os.getenv('SEARCH_NGRAM_TOKEN_SIZE', 2))
+
+
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _month_range(year, month):
+    # [first day of month, first day of next month)
+    month_start = datetime(year, month, 1).date()
+    if month == 12:
+        return month_start, datetime(year + 1, 1, 1).date()
+    return month_start, datetime(year, month + 1, 1).date()
+
 
 
 # Add Student
@@ -35,8 +104,8 @@ def add_student():
 
     full_name = f"{data.get('first_name')} {data.get('last_name')}"
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = get_cursor()
 
         sql = """
         INSERT INTO students (full_name, date_of_birth, gender, email, phone, address, grade, fee_status, total_fee, status)
@@ -57,6 +126,7 @@ def add_student():
 
         cursor.execute(sql, values)
         conn.commit()
+        invalidate_dashboard_statistics()
 
         student_id = cursor.lastrowid
 
@@ -73,33 +143,210 @@ def add_student():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
+def _import_records(upload):
+    # Yield (row number, record) from a CSV, NDJSON or JSON array upload.
+    # CSV and NDJSON are read line by line; a JSON array is parsed whole.
+    filename = (upload.filename or '').lower()
+    text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+    if filename.endswith(('.ndjson', '.jsonl')):
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+    elif filename.endswith('.json'):
+        records = json.load(text)
+        if not isinstance(records, list):
+            raise ValueError("JSON upload must be a list of students")
+        yield from enumerate(records, start=1)
+    else:
+        # row numbers are file lines, the header being line 1
+        yield from enumerate(csv.DictReader(text), start=2)
+
+
+def _validate_student(record):
+    # Returns (values tuple in STUDENT_IMPORT_COLUMNS order, None) or (None, error)
+    if not isinstance(record, dict):
+        return None, "Invalid record"
+    row = {key: (value.strip() if isinstance(value, str) else value) for key, value in record.items()}
+    for field in STUDENT_IMPORT_TEXT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))):
+            return None, f"{field} must be a string"
+        if isinstance(value, (int, float)):
+            row[field] = str(value)
+    full_name = row.get('full_name') or ' '.join(filter(None, (row.get('first_name'), row.get('last_name'))))
+    if not full_name or not row.get('grade'):
+        return None, "full_name (or first_name/last_name) and grade are required"
+    if len(full_name) > 225 or len(row['grade']) > 225:
+        return None, "full_name and grade must be at most 225 characters"
+
+    for field, allowed in (('gender', STUDENT_GENDERS), ('fee_status', STUDENT_FEE_STATUSES),
+                           ('status', STUDENT_STATUSES)):
+        if row.get(field) and row[field] not in allowed:
+            return None, f"Invalid {field} '{row[field]}'"
+    for field, length in (('email', 100), ('phone', 15)):
+        if row.get(field) and len(row[field]) > length:
+            return None, f"{field} must be at most {length} characters"
+
+    try:
+        date_of_birth = datetime.strptime(row['date_of_birth'], '%Y-%m-%d').date() if row.get('date_of_birth') else None
+    except (TypeError, ValueError):
+        return None, "date_of_birth must be YYYY-MM-DD"
+    try:
+        total_fee = float(row['total_fee']) if row.get('total_fee') not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, "total_fee must be a number"
+
+    return (full_name, date_of_birth, row.get('gender') or None, row.get('email') or None,
+            row.get('phone') or None, row.get('address') or None, row['grade'],
+            row.get('fee_status') or 'pending', total_fee, row.get('status') or 'active'), None
+
+
+# Bulk import students from an uploaded CSV, NDJSON or JSON file
+@app.route('/import_students', methods=['POST'])
+@roles_required('admin', 'staff')
+def import_students():
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({"status": "error", "message": "A CSV, NDJSON or JSON file is required"}), 400
+    # all_or_nothing=1 rolls back the whole import if any row is invalid
+    all_or_nothing = request.form.get('all_or_nothing', request.args.get('all_or_nothing')) in ('1', 'true')
+
+    errors = []
+    error_count = 0
+    imported = 0
+    id_ranges = []
+    batch = []
+
+    def insert_batch():
+        cursor.execute(f"""
+            INSERT INTO students ({", ".join(STUDENT_IMPORT_COLUMNS)})
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(batch))}
+        """, [value for values in batch for value in values])
+        # a multi-row insert gets consecutive ids starting at lastrowid
+        first_id, last_id = cursor.lastrowid, cursor.lastrowid + len(batch) - 1
+        if id_ranges and id_ranges[-1]["last_id"] + 1 == first_id:
+            id_ranges[-1]["last_id"] = last_id
+        else:
+            id_ranges.append({"first_id": first_id, "last_id": last_id})
+        batch.clear()
+
+    connection = None
+    try:
+        connection = get_db()
+        cursor = get_cursor()
+
+        # Rows are validated and inserted as the upload is read, one
+        # STUDENT_IMPORT_CHUNK_SIZE statement at a time, in a single transaction
+        for number, record in _import_records(upload):
+            values, error = _validate_student(record)
+            if error:
+                error_count += 1
+                if len(errors) < STUDENT_IMPORT_MAX_ERRORS:
+                    errors.append({"row": number, "error": error})
+                continue
+            if all_or_nothing and error_count:
+                continue
+            batch.append(values)
+            imported += 1
+            if len(batch) >= STUDENT_IMPORT_CHUNK_SIZE:
+                insert_batch()
+
+        if all_or_nothing and error_count:
+            connection.rollback()
+            return jsonify({
+                "status": "error",
+                "message": "No students imported",
+                "data": {"error_count": error_count, "errors": errors}
+            }), 400
+
+        if batch:
+            insert_batch()
+        connection.commit()
+        if imported:
+            invalidate_dashboard_statistics()
+
+        return jsonify({
+            "status": "success",
+            "message": f"{imported} students imported",
+            "data": {
+                "imported_count": imported,
+                "id_ranges": id_ranges,
+                "error_count": error_count,
+                "errors": errors
+            }
+        }), 200
+
+    except (ValueError, csv.Error) as e:
+        if connection:
+            connection.rollback()
+        return jsonify({"status": "error", "message": f"Could not read upload: {e}"}), 400
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 500
 
 # Get All Students
 @app.route('/get_students', methods=['GET'])
 def get_all_students():
+    # Keyset pagination: ?after=<student_id>&limit=N, next page via next_cursor
     try:
-        conn = create_connection()
-        cursor = conn.cursor(dictionary=True)
+        limit = min(int(request.args.get('limit', STUDENTS_PAGE_SIZE)), STUDENTS_MAX_PAGE_SIZE)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and after must be integers"}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "limit must be positive"}), 400
+
+    fields = request.args.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in STUDENT_FIELDS]
+        if unknown:
+            return jsonify({"status": "error", "message": f"Unknown fields: {', '.join(unknown)}"}), 400
+        # student_id is always returned, it is the pagination cursor
+        fields = ['student_id'] + [f for f in fields if f != 'student_id']
+    else:
+        fields = STUDENT_DEFAULT_FIELDS
 
-        cursor.execute("SELECT student_id, full_name, grade, gender, fee_status, status FROM students")
+    conditions = ["student_id > %s"]
+    params = [after]
+    for column in ('grade', 'status', 'fee_status'):
+        value = request.args.get(column)
+        if value:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+
+    try:
+        cursor = get_cursor(dictionary=True)
+
+        cursor.execute(f"""
+            SELECT {", ".join(fields)}
+            FROM students
+            WHERE {" AND ".join(conditions)}
+            ORDER BY student_id
+            LIMIT %s
+        """, params + [limit + 1])
         students = cursor.fetchall()
 
-        return jsonify({"status": "success", "data": students}), 200
+        next_cursor = None
+        if len(students) > limit:
+            students = students[:limit]
+            next_cursor = students[-1]['student_id']
+
+        return jsonify({"status": "success", "data": students, "next_cursor": next_cursor}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
-
 # Get Student by ID
 @app.route('/get_student/<int:student_id>', methods=['GET'])
 def get_student_by_id(student_id):
     try:
-        conn = create_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = get_cursor(dictionary=True)
 
         cursor.execute("SELECT * FROM students WHERE student_id = %s", (student_id,))
         student = cursor.fetchone()
@@ -112,17 +359,14 @@ def get_student_by_id(student_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
-
 # Update Student
 @app.route('/update_student/<int:student_id>', methods=['PUT'])
 def update_student(student_id):
     data = request.form
 
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = get_cursor()
 
         cursor.execute("""
             UPDATE students
@@ -130,57 +374,76 @@ def update_student(student_id):
             WHERE student_id = %s
         """, (f"{data.get('first_name')} {data.get('last_name')}", data.get('email'), data.get('phone'), student_id))
         conn.commit()
+        invalidate_dashboard_statistics()
 
         return jsonify({"status": "success", "message": "Student details updated successfully"}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
-
 # Delete Student
 @app.route('/delete_student/<int:student_id>', methods=['DELETE'])
 def delete_student(student_id):
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = get_db()
+        cursor = get_cursor()
 
         cursor.execute("DELETE FROM students WHERE student_id = %s", (student_id,))
         conn.commit()
+        invalidate_dashboard_statistics()
 
         return jsonify({"status": "success", "message": f"Student with id {student_id} deleted successfully"}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
-
 # Search Students
 @app.route('/search_student/search', methods=['GET'])
 def search_students():
     query = request.args.get('query', '')
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+
+    # Strip boolean-mode operators so user input is only ever search terms
+    terms = re.sub(r'[+\-<>()~*"@]', ' ', query).split()
+    if not terms or limit < 1:
+        return jsonify({"status": "success", "data": []}), 200
 
     try:
-        conn = create_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = get_cursor(dictionary=True)
 
-        cursor.execute("""
-            SELECT student_id, full_name, grade, email, phone
-            FROM students
-            WHERE full_name LIKE %s
-        """, (f"%{query}%",))
+        if len("".join(terms)) < SEARCH_NGRAM_TOKEN_SIZE:
+            # Too short to form an ngram: name prefix on idx_students_full_name
+            prefix = terms[0].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            cursor.execute("""
+                SELECT student_id, full_name, grade, email, phone
+                FROM students
+                WHERE full_name LIKE %s
+                ORDER BY full_name
+                LIMIT %s
+            """, (f"{prefix}%", limit))
+        else:
+            # Every term must match; a trailing * keeps short terms working as prefixes
+            against = " ".join(f"+{term}*" for term in terms)
+            cursor.execute("""
+                SELECT student_id, full_name, grade, email, phone,
+                       MATCH(full_name, email, phone) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM students
+                WHERE MATCH(full_name, email, phone) AGAINST (%s IN BOOLEAN MODE)
+                ORDER BY score DESC, student_id
+                LIMIT %s
+            """, (against, against, limit))
         results = cursor.fetchall()
+        for row in results:
+            row.pop('score', None)
 
         return jsonify({"status": "success", "data": results}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(conn)
-
 
 @app.route("/record_payment", methods=["POST"])
 def record_payment():
@@ -190,21 +453,31 @@ def record_payment():
     remarks = request.form.get('remarks', '')
     payment_date = request.form.get('payment_date', datetime.now().strftime('%Y-%m-%d'))
 
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
+    try:
+        payment_amount = float(payment_amount)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "payment_amount must be a number"}), 400
 
+    connection = None
     try:
-        # Get student info
-        cursor.execute("SELECT total_fee FROM students WHERE student_id = %s", (student_id,))
+        connection = get_db()
+        cursor = get_cursor(dictionary=True)
+
+        # Student fee and running balance; FOR UPDATE serialises concurrent
+        # payments for the same student until commit
+        cursor.execute("""
+            SELECT s.total_fee, COALESCE(b.total_paid, 0) AS total_paid
+            FROM students s
+            LEFT JOIN student_fee_balances b ON b.student_id = s.student_id
+            WHERE s.student_id = %s
+            FOR UPDATE
+        """, (student_id,))
         student = cursor.fetchone()
         if not student:
             return jsonify({"status": "error", "message": "Student not found"}), 404
 
         total_fee = float(student['total_fee'])
-
-        # Calculate total paid so far
-        cursor.execute("SELECT COALESCE(SUM(amount_paid), 0) as total_paid FROM student_fees WHERE student_id = %s", (student_id,))
-        total_paid = float(cursor.fetchone()['total_paid'])
+        total_paid = float(student['total_paid'])
 
         # Insert new payment
         cursor.execute("""
@@ -214,54 +487,62 @@ def record_payment():
             student_id,
             payment_amount,
             total_fee,
-            'completed' if total_paid + float(payment_amount) >= total_fee else 'pending',
+            'completed' if total_paid + payment_amount >= total_fee else 'pending',
             payment_method,
             remarks,
             payment_date
         ))
 
+        cursor.execute("""
+            INSERT INTO student_fee_balances (student_id, total_paid)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE total_paid = total_paid + VALUES(total_paid)
+        """, (student_id, payment_amount))
+
         # Update student fee status if fully paid
-        new_total_paid = total_paid + float(payment_amount)
+        new_total_paid = total_paid + payment_amount
         new_status = 'completed' if new_total_paid >= total_fee else 'pending'
         cursor.execute("UPDATE students SET fee_status = %s WHERE student_id = %s", (new_status, student_id))
 
         connection.commit()
+        invalidate_dashboard_statistics()
 
         return jsonify({
             "status": "success",
             "message": "Payment recorded successfully",
             "data": {
                 "student_id": int(student_id),
-                "payment_amount": float(payment_amount),
+                "payment_amount": payment_amount,
                 "new_balance": float(total_fee) - new_total_paid,
                 "payment_date": payment_date
             }
         }), 200
 
     except Exception as e:
-        connection.rollback()
+        if connection:
+            connection.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(connection)
 
 # Check Fee Dues
 @app.route('/fee_dues/<int:student_id>', methods=['GET'])
 def check_fee_dues(student_id):
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
-
     try:
-        # Get student info
-        cursor.execute("SELECT full_name, grade, total_fee, fee_status FROM students WHERE student_id = %s", (student_id,))
+        cursor = get_cursor(dictionary=True)
+
+        # Student info and running balance in one primary key lookup
+        cursor.execute("""
+            SELECT s.full_name, s.grade, s.total_fee, s.fee_status, COALESCE(b.total_paid, 0) AS total_paid
+            FROM students s
+            LEFT JOIN student_fee_balances b ON b.student_id = s.student_id
+            WHERE s.student_id = %s
+        """, (student_id,))
         student = cursor.fetchone()
 
         if not student:
             return jsonify({"status": "error", "message": "Student not found"}), 404
 
-        # Total paid
-        cursor.execute("SELECT COALESCE(SUM(amount_paid), 0) as total_paid FROM student_fees WHERE student_id = %s", (student_id,))
-        total_paid = float(cursor.fetchone()['total_paid'])
+        total_paid = float(student['total_paid'])
         due_amount = float(student['total_fee']) - total_paid
 
         return jsonify({
@@ -280,48 +561,190 @@ def check_fee_dues(student_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(connection)
     
+def reconcile_fee_balances(cursor):
+    # Rebuild student_fee_balances (and students.fee_status) from student_fees
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM students s
+        LEFT JOIN student_fee_balances b ON b.student_id = s.student_id
+        LEFT JOIN (
+            SELECT student_id, SUM(amount_paid) AS total_paid
+            FROM student_fees
+            GROUP BY student_id
+        ) paid ON paid.student_id = s.student_id
+        WHERE COALESCE(b.total_paid, -1) <> COALESCE(paid.total_paid, 0)
+    """)
+    corrected = cursor.fetchone()[0]
+
+    cursor.execute("""
+        INSERT INTO student_fee_balances (student_id, total_paid)
+        SELECT s.student_id, COALESCE(SUM(sf.amount_paid), 0)
+        FROM students s
+        LEFT JOIN student_fees sf ON sf.student_id = s.student_id
+        GROUP BY s.student_id
+        ON DUPLICATE KEY UPDATE total_paid = VALUES(total_paid)
+    """)
+    cursor.execute("""
+        UPDATE students s
+        JOIN student_fee_balances b ON b.student_id = s.student_id
+        SET s.fee_status = IF(b.total_paid >= s.total_fee, 'completed', 'pending')
+    """)
+    return corrected
+
+
+@app.route('/reconcile_fee_balances', methods=['POST'])
+@roles_required('admin')
+def reconcile_fee_balances_route():
+    connection = get_db()
+    if not connection:
+        return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
+
+    try:
+        corrected = reconcile_fee_balances(get_cursor())
+        connection.commit()
+        invalidate_dashboard_statistics()
+        return jsonify({"status": "success", "data": {"corrected_balances": corrected}}), 200
+    except Exception as e:
+        connection.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.cli.command("reconcile-fee-balances")
+def reconcile_fee_balances_command():
+    connection = get_db()
+    if not connection:
+        print("Database connection failed")
+        return
+    corrected = reconcile_fee_balances(get_cursor())
+    connection.commit()
+    print(f"Reconciled fee balances, {corrected} corrected")
+
+def _fee_report_range():
+    # Inclusive start_date/end_date from the query string as a half-open
+    # datetime range, so payments late on end_date are counted
+    start_date = datetime.strptime(request.args.get('start_date', ''), '%Y-%m-%d')
+    end_date = datetime.strptime(request.args.get('end_date', ''), '%Y-%m-%d')
+    return start_date, end_date + timedelta(days=1)
+
+
+def _fee_transactions_page(cursor, range_start, range_end, after, limit):
+    cursor.execute("""
+        SELECT sf.fee_id, sf.student_id, s.full_name, sf.amount_paid, sf.payment_date, sf.payment_method
+        FROM student_fees sf
+        JOIN students s ON sf.student_id = s.student_id
+        WHERE sf.payment_date >= %s AND sf.payment_date < %s AND sf.fee_id > %s
+        ORDER BY sf.fee_id
+        LIMIT %s
+    """, (range_start, range_end, after, limit + 1))
+    transactions = cursor.fetchall()
+
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = transactions[-1]['fee_id']
+    return transactions, next_cursor
+
+
 @app.route('/fee_collection', methods=['GET'])
 def fee_collection_report():
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
+    try:
+        range_start, range_end = _fee_report_range()
+    except ValueError:
+        return jsonify({"status": "error", "message": "start_date and end_date (YYYY-MM-DD) are required"}), 400
+    try:
+        limit = min(int(request.args.get('limit', FEE_TRANSACTIONS_PAGE_SIZE)), FEE_TRANSACTIONS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "limit must be positive"}), 400
 
     try:
+        cursor = get_cursor(dictionary=True)
+
+        # Totals and breakdowns are aggregated by MySQL over the
+        # (payment_date, payment_method, amount_paid) index
         cursor.execute("""
-            SELECT sf.fee_id, sf.student_id, s.full_name, sf.amount_paid, sf.payment_date, sf.payment_method
-            FROM student_fees sf
-            JOIN students s ON sf.student_id = s.student_id
-            WHERE sf.payment_date BETWEEN %s AND %s
-        """, (start_date, end_date))
-        transactions = cursor.fetchall()
+            SELECT COUNT(*) AS total_transactions, COALESCE(SUM(amount_paid), 0) AS total_collected
+            FROM student_fees
+            WHERE payment_date >= %s AND payment_date < %s
+        """, (range_start, range_end))
+        totals = cursor.fetchone()
 
-        total_collected = sum(t['amount_paid'] for t in transactions)
-        total_transactions = len(transactions)
+        cursor.execute("""
+            SELECT payment_method, SUM(amount_paid) AS total
+            FROM student_fees
+            WHERE payment_date >= %s AND payment_date < %s
+            GROUP BY payment_method
+        """, (range_start, range_end))
+        collection_by_method = {row['payment_method']: float(row['total']) for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT DATE(payment_date) AS day, COUNT(*) AS transactions, SUM(amount_paid) AS total
+            FROM student_fees
+            WHERE payment_date >= %s AND payment_date < %s
+            GROUP BY DATE(payment_date)
+            ORDER BY day
+        """, (range_start, range_end))
+        collection_by_day = [
+            {"date": row['day'].isoformat(), "transactions": row['transactions'], "total": float(row['total'])}
+            for row in cursor.fetchall()
+        ]
 
-        collection_by_method = {}
-        for t in transactions:
-            method = t['payment_method']
-            collection_by_method[method] = collection_by_method.get(method, 0) + t['amount_paid']
+        cursor.execute("""
+            SELECT s.grade, COUNT(*) AS transactions, SUM(sf.amount_paid) AS total
+            FROM student_fees sf
+            JOIN students s ON sf.student_id = s.student_id
+            WHERE sf.payment_date >= %s AND sf.payment_date < %s
+            GROUP BY s.grade
+            ORDER BY s.grade
+        """, (range_start, range_end))
+        collection_by_grade = [
+            {"grade": row['grade'], "transactions": row['transactions'], "total": float(row['total'])}
+            for row in cursor.fetchall()
+        ]
+
+        # First page of detail; further pages from /fee_collection/transactions
+        transactions, next_cursor = _fee_transactions_page(cursor, range_start, range_end, 0, limit)
 
         return jsonify({
             "status": "success",
             "data": {
-                "total_collected": total_collected,
-                "total_transactions": total_transactions,
+                "total_collected": float(totals['total_collected']),
+                "total_transactions": totals['total_transactions'],
                 "collection_by_method": collection_by_method,
-                "transactions": transactions
+                "collection_by_day": collection_by_day,
+                "collection_by_grade": collection_by_grade,
+                "transactions": transactions,
+                "next_cursor": next_cursor
             }
         }), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        close_connection(connection)
+
+
+@app.route('/fee_collection/transactions', methods=['GET'])
+def fee_collection_transactions():
+    try:
+        range_start, range_end = _fee_report_range()
+    except ValueError:
+        return jsonify({"status": "error", "message": "start_date and end_date (YYYY-MM-DD) are required"}), 400
+    try:
+        limit = min(int(request.args.get('limit', FEE_TRANSACTIONS_PAGE_SIZE)), FEE_TRANSACTIONS_MAX_PAGE_SIZE)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and after must be integers"}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "limit must be positive"}), 400
+
+    try:
+        cursor = get_cursor(dictionary=True)
+        transactions, next_cursor = _fee_transactions_page(cursor, range_start, range_end, after, limit)
+        return jsonify({"status": "success", "data": transactions, "next_cursor": next_cursor}), 200
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
 # Mark Attendance
 @app.route('/mark_attendance', methods=['POST'])
@@ -332,89 +755,145 @@ def mark_attendance():
     status = request.form.get('status')
     remarks = request.form.get('remarks', '')
 
-    connection = create_connection()
-    cursor = connection.cursor()
-
     try:
+        connection = get_db()
+        cursor = get_cursor()
+
         cursor.execute("""
             INSERT INTO attendance (student_id, date, status, remarks)
             VALUES (%s, %s, %s, %s)
             ON DUPLICATE KEY UPDATE status=%s, remarks=%s
         """, (student_id, date, status, remarks, status, remarks))
         connection.commit()
+        invalidate_dashboard_statistics()
 
         return jsonify({"status": "success", "message": "Attendance marked successfully"}), 200
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(connection)
 
 
 @app.route('/bulk_attendance', methods=['POST'])
 def bulk_mark_attendance():
-    date = request.form.get('date')
-    grade = request.form.get('grade')
-    attendance_data_str = request.form.get('attendance_data', '[]')
-    
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
-    
+    # Accept a JSON body as well as form data so very large batches are not
+    # capped by the form field size limit
+    payload = request.get_json(silent=True) or request.form
+    if not isinstance(payload, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object or form data"}), 400
+    date = payload.get('date')
+    grade = payload.get('grade')
+    attendance_data = payload.get('attendance_data', '[]')
+
     try:
         # Parse the JSON string into a Python object
-        attendance_data = json.loads(attendance_data_str)
-        
-        for record in attendance_data:
-            student_id = record.get('student_id')
-            status = record.get('status')
-            remarks = record.get('remarks', '')
-            
-            cursor.execute("""
+        if isinstance(attendance_data, str):
+            attendance_data = json.loads(attendance_data)
+        datetime.strptime(date or '', '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "date (YYYY-MM-DD) and a JSON attendance_data list are required"}), 400
+
+    if not isinstance(attendance_data, list):
+        return jsonify({"status": "error", "message": "attendance_data must be a list"}), 400
+
+    # Validate every row up front; later rows for the same student win
+    failed = []
+    rows = {}
+    for index, record in enumerate(attendance_data):
+        if not isinstance(record, dict):
+            failed.append({"index": index, "student_id": None, "error": "Invalid record"})
+            continue
+        status = record.get('status')
+        try:
+            student_id = int(record.get('student_id'))
+        except (TypeError, ValueError):
+            failed.append({"index": index, "student_id": record.get('student_id'), "error": "Invalid student_id"})
+            continue
+        if status not in ATTENDANCE_STATUSES:
+            failed.append({"index": index, "student_id": student_id, "error": f"Invalid status '{status}'"})
+            continue
+        remarks = record.get('remarks', '')
+        if remarks is not None and not isinstance(remarks, str):
+            failed.append({"index": index, "student_id": student_id, "error": "remarks must be a string"})
+            continue
+        rows[student_id] = (index, student_id, status, remarks)
+
+    connection = None
+    try:
+        connection = get_db()
+        cursor = get_cursor()
+
+        marked_count = 0
+        for chunk in _chunked(list(rows.values()), ATTENDANCE_CHUNK_SIZE):
+            # Drop rows for unknown students instead of failing the whole chunk on the FK
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT student_id FROM students WHERE student_id IN ({placeholders})",
+                           [row[1] for row in chunk])
+            known_ids = {row[0] for row in cursor.fetchall()}
+
+            values = []
+            for index, student_id, status, remarks in chunk:
+                if student_id not in known_ids:
+                    failed.append({"index": index, "student_id": student_id, "error": "Student not found"})
+                    continue
+                values.extend((student_id, date, status, remarks))
+            if not values:
+                continue
+
+            row_count = len(values) // 4
+            cursor.execute(f"""
                 INSERT INTO attendance (student_id, date, status, remarks)
-                VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE status=%s, remarks=%s
-            """, (student_id, date, status, remarks, status, remarks))
-        
+                VALUES {", ".join(["(%s, %s, %s, %s)"] * row_count)}
+                ON DUPLICATE KEY UPDATE status = VALUES(status), remarks = VALUES(remarks)
+            """, values)
+            marked_count += row_count
+
         connection.commit()
+        invalidate_dashboard_statistics()
+        failed.sort(key=lambda f: f["index"])
         return jsonify({
             "status": "success",
             "message": "Bulk attendance marked successfully",
             "data": {
-                "marked_count": len(attendance_data),
+                "marked_count": marked_count,
+                "failed_count": len(failed),
+                "failed": failed,
                 "grade": grade,
                 "date": date
             }
         }), 200
-    
+
     except Exception as e:
+        if connection:
+            connection.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        close_connection(connection)
 
 # Get Student Attendance
 @app.route('/get_attendance/<int:student_id>', methods=['GET'])
 def get_student_attendance(student_id):
-    month = int(request.args.get('month'))
-    year = int(request.args.get('year'))
-
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
+    try:
+        month = int(request.args.get('month'))
+        year = int(request.args.get('year'))
+        month_start, next_month_start = _month_range(year, month)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Valid month and year are required"}), 400
 
     try:
+        cursor = get_cursor(dictionary=True)
+
         # Student info
         cursor.execute("SELECT full_name, grade FROM students WHERE student_id = %s", (student_id,))
         student = cursor.fetchone()
         if not student:
             return jsonify({"status": "error", "message": "Student not found"}), 404
 
-        # Attendance records
+        # Attendance records; half-open range so (student_id, date) is a range scan
         cursor.execute("""
             SELECT date, status, remarks
             FROM attendance
-            WHERE student_id = %s AND MONTH(date) = %s AND YEAR(date) = %s
+            WHERE student_id = %s AND date >= %s AND date < %s
             ORDER BY date
-        """, (student_id, month, year))
+        """, (student_id, month_start, next_month_start))
         records = cursor.fetchall()
 
         summary = {"present": 0, "absent": 0, "late": 0}
@@ -442,8 +921,6 @@ def get_student_attendance(student_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-    finally:
-        close_connection(connection)
 
 
 # Get Class Attendance
@@ -451,10 +928,9 @@ def get_student_attendance(student_id):
 def get_class_attendance(grade):
     date = request.args.get('date')
 
-    connection = create_connection()
-    cursor = connection.cursor(dictionary=True)
-
     try:
+        cursor = get_cursor(dictionary=True)
+
         # Students in grade
         cursor.execute("SELECT student_id, full_name FROM students WHERE grade = %s", (grade,))
         all_students = cursor.fetchall()
@@ -490,8 +966,6 @@ def get_class_attendance(grade):
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        close_connection(connection)
     
 @app.route('/add_exam', methods=['POST'])
 def add_exam():
@@ -501,12 +975,12 @@ def add_exam():
     end_date = data.get('end_date')
     description = data.get('description')
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
+        cursor = get_cursor()
         query = """
             INSERT INTO exams (exam_name, start_date, end_date, description)
             VALUES (%s, %s, %s, %s)
@@ -527,8 +1001,6 @@ def add_exam():
         }), 200
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
 
 
 @app.route('/add_subject', methods=['POST'])
@@ -541,10 +1013,10 @@ def add_subject():
     if not all([subject_name, subject_code]):
         return jsonify({"status": "error", "message": "Missing required fields"}), 400
 
-    conn = create_connection()
+    conn = get_db()
     if conn:
         try:
-            cursor = conn.cursor()
+            cursor = get_cursor()
             query = """
                 INSERT INTO subjects (subject_name, subject_code)
                 VALUES (%s, %s)
@@ -564,8 +1036,6 @@ def add_subject():
             }), 201
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
-        finally:
-            close_connection(conn)
     else:
         return jsonify({"status": "error", "message": "Database connection failed"}), 500
 
@@ -582,12 +1052,12 @@ def add_exam_result():
     grade = data.get('grade')
     remarks = data.get('remarks')
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
+        cursor = get_cursor()
         query = """
             INSERT INTO exam_results (exam_id, student_id, subject_id, marks_obtained, total_marks, grade, remarks)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
@@ -598,19 +1068,17 @@ def add_exam_result():
         return jsonify({'status': 'success', 'message': 'Exam result added successfully'}), 201
     except mysql.connector.Error as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
+
 @app.route("/get_student_result", methods = ["GET"])
 def get_student_result():
     student_id = request.args.get("student_id")
 
     if not student_id:
-        jsonify({"Error":"student_id is required"}), 400
-
-    conn = create_connection()
-    cursor = conn.cursor(dictionary = True)
+        return jsonify({"Error":"student_id is required"}), 400
 
     try:
+        cursor = get_cursor(dictionary = True)
+
         query ="""
         SELECT
         er.result_id,
@@ -636,9 +1104,6 @@ def get_student_result():
         return jsonify({"student_id":student_id, "results":results}), 200
     except Exception as e:
         return jsonify({"Error":str(e)}), 500
-    finally:
-        cursor.close()
-        close_connection(conn)
 
 
 
@@ -653,12 +1118,12 @@ def add_parent():
     address = data.get('address')
     occupation = data.get('occupation')
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
+        cursor = get_cursor()
         query = """
             INSERT INTO parents (full_name, relationship, phone, email, address, occupation)
             VALUES (%s, %s, %s, %s, %s, %s)
@@ -677,8 +1142,6 @@ def add_parent():
         }), 201
     except mysql.connector.Error as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
 
 # Link Parent to Student
 @app.route('/api/parents/link', methods=['POST'])
@@ -687,12 +1150,12 @@ def link_parent():
     parent_id = data.get('parent_id')
     student_id = data.get('student_id')
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
+        cursor = get_cursor()
         query = """
             INSERT INTO student_parent (parent_id, student_id) VALUES (%s, %s)
         """
@@ -702,18 +1165,16 @@ def link_parent():
         return jsonify({'status': 'success', 'message': 'Parent linked to student successfully'}), 200
     except mysql.connector.Error as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
 
 # Get Student Parents
 @app.route('/api/students/<int:student_id>/', methods=['GET'])
 def get_student_parents(student_id):
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor(dictionary=True)
+        cursor = get_cursor(dictionary=True)
         cursor.execute("SELECT full_name FROM students WHERE student_id = %s", (student_id,))
         student = cursor.fetchone()
 
@@ -735,15 +1196,13 @@ def get_student_parents(student_id):
         }), 200
     except mysql.connector.Error as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
-    
-
-        
-
-
 
 
+# Connection pool stats for monitoring
+@app.route('/db_pool_stats', methods=['GET'])
+@roles_required('admin')
+def get_db_pool_stats():
+    return jsonify({"status": "success", "data": pool_stats()}), 200
 
 
 if __name__ == "__main__":
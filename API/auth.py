@@ -1,14 +1,21 @@
 from flask import Blueprint
-from flask import Flask, request, jsonify, current_app
-from dbconn import create_connection, close_connection
+from flask import Flask, request, jsonify, current_app, g
+from dbconn import get_db, get_cursor
+from mysql.connector import errorcode, IntegrityError
+from passwords import hash_password, hash_passwords, verify_password, needs_rehash, HashQueueFull
+from jwt_auth import public, roles_required, revocations, bearer_token, verify_token
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import calendar
 from calendar import month_name
+import click
+import csv
+import io
 import json
 import os
+import uuid
 from dotenv import load_dotenv
 
 
@@ -17,10 +24,19 @@ from dotenv import load_dotenv
 
 auth_bp = Blueprint("auth", __name__)
 
+USER_ROLES = ('admin', 'teacher', 'staff')
+# Roles anyone may register for; the rest need an admin's token
+SELF_REGISTER_ROLES = ('teacher', 'staff')
+USER_FIELDS = ('username', 'password', 'email', 'full_name', 'role')
+BULK_USERS_MAX_ROWS = int(os.getenv('BULK_USERS_MAX_ROWS', 200))
+# Rows per multi-row INSERT, so an upload at the row cap is still several statements
+BULK_USERS_CHUNK_SIZE = int(os.getenv('BULK_USERS_CHUNK_SIZE', 50))
+
 
 
 #Register API
 @auth_bp.route("/register", methods = ['POST'])
+@public
 def register_user():
     username = request.form.get('username')
     password = request.form.get('password')
@@ -30,17 +46,19 @@ def register_user():
 
     if not all([username, password, email, full_name, role]):
         return jsonify({"status":"Error", "message":"All fields are required"}), 400
-    hashed_password = generate_password_hash(password)
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-
+    if role not in USER_ROLES:
+        return jsonify({"status":"Error", "message":f"Invalid role '{role}'"}), 400
+    if role not in SELF_REGISTER_ROLES:
+        token = bearer_token()
+        claims = verify_token(token) if token else None
+        if claims is None or claims.get('role') != 'admin':
+            return jsonify({"status":"Error", "message":f"Only an admin can register '{role}' accounts"}), 403
     try:
-        # check if username or email already exits
-        cursor.execute("select * from users where username = %s or email = %s", (username, email))
-        if cursor.fetchone():
-            return jsonify({"status":"Error", "message":"username or email already exists"}), 400
-        
-        # insert new user
+        hashed_password = hash_password(password)
+        conn = get_db()
+        cursor = get_cursor(dictionary=True)
+
+        # insert new user; the unique keys on username and email reject duplicates
         cursor.execute("""
         insert into users(username, password, email, role, full_name)
         values(%s, %s, %s, %s, %s)""", (username, hashed_password, email, role, full_name))
@@ -59,14 +77,107 @@ def register_user():
                 }
             }
         ), 200
+    except IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return jsonify({"status":"Error", "message":"username or email already exists"}), 400
+        return jsonify({"status": "Error", "message": str(e)}), 500
+    except HashQueueFull as e:
+        return jsonify({"status": "Error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "Error", "message": str(e)}), 500
-    finally:
-        cursor.close()
-        close_connection(conn)
+
+
+# First admin account (later ones can be registered by an admin):
+#   flask --app app auth create-admin <username> <email> <full_name>
+@auth_bp.cli.command("create-admin")
+@click.argument("username")
+@click.argument("email")
+@click.argument("full_name")
+@click.password_option()
+def create_admin_command(username, email, full_name, password):
+    conn = get_db()
+    if not conn:
+        print("Database connection failed")
+        return
+    cursor = get_cursor()
+    try:
+        cursor.execute("""
+        insert into users(username, password, email, role, full_name)
+        values(%s, %s, %s, 'admin', %s)""", (username, hash_password(password), email, full_name))
+        conn.commit()
+        print(f"Admin {username} created with user_id {cursor.lastrowid}")
+    except IntegrityError as e:
+        print(f"Could not create admin: {e.msg}")
+
+
+# Bulk user provisioning from a CSV upload (columns: username, password, email,
+# full_name, role); all accounts are created in one transaction or none are
+@auth_bp.route("/register/bulk", methods=['POST'])
+@roles_required('admin')
+def register_users_bulk():
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({"status":"Error", "message":"A CSV file is required"}), 400
+
+    reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+    missing = [field for field in USER_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        return jsonify({"status":"Error", "message":f"Missing columns: {', '.join(missing)}"}), 400
+
+    users = []
+    errors = []
+    seen = set()
+    for line, row in enumerate(reader, start=2):
+        if len(users) + len(errors) >= BULK_USERS_MAX_ROWS:
+            return jsonify({"status":"Error", "message":f"At most {BULK_USERS_MAX_ROWS} users per upload"}), 400
+        values = {field: (row.get(field) or '').strip() for field in USER_FIELDS}
+        if not all(values.values()):
+            errors.append({"line": line, "error": "All fields are required"})
+        elif values['role'] not in USER_ROLES:
+            errors.append({"line": line, "error": f"Invalid role '{values['role']}'"})
+        elif values['username'].lower() in seen or values['email'].lower() in seen:
+            errors.append({"line": line, "error": "Duplicate username or email in file"})
+        else:
+            seen.update((values['username'].lower(), values['email'].lower()))
+            users.append(values)
+
+    if errors or not users:
+        return jsonify({"status":"Error", "message":"No users created", "errors": errors}), 400
+
+    try:
+        # hashed a few at a time so logins keep getting pool slots
+        hashed = hash_passwords([user['password'] for user in users])
+        conn = get_db()
+        cursor = get_cursor()
+
+        created = []
+        for start in range(0, len(users), BULK_USERS_CHUNK_SIZE):
+            chunk = users[start:start + BULK_USERS_CHUNK_SIZE]
+            cursor.execute(f"""
+            insert into users(username, password, email, role, full_name)
+            values {", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))}""",
+                [value for offset, user in enumerate(chunk)
+                 for value in (user['username'], hashed[start + offset], user['email'], user['role'], user['full_name'])])
+            # a multi-row insert gets consecutive ids starting at lastrowid
+            created.extend({"user_id": cursor.lastrowid + offset, "username": user['username']}
+                           for offset, user in enumerate(chunk))
+        conn.commit()
+
+        return jsonify({"status":"success", "message":f"{len(created)} users registered", "data": created}), 200
+    except IntegrityError as e:
+        conn.rollback()
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return jsonify({"status":"Error", "message":f"No users created: {e.msg}"}), 400
+        return jsonify({"status": "Error", "message": str(e)}), 500
+    except HashQueueFull as e:
+        return jsonify({"status": "Error", "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"status": "Error", "message": str(e)}), 500
+
 
 # login API
 @auth_bp.route("/login", methods=["POST"])
+@public
 def login_user():
     username = request.form.get('username')
     password = request.form.get('password')
@@ -76,22 +187,29 @@ def login_user():
         return jsonify({"status":"Error", "message":"All fields are required"}), 400
 
     
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-
     try:
+        conn = get_db()
+        cursor = get_cursor(dictionary=True)
+
         cursor.execute("select * from users where username = %s", (username,))
         results = cursor.fetchone()
 
 
-        if not results or not check_password_hash(results['password'], password):
+        if not results or not verify_password(results['password'], password):
             return jsonify({"status": "fail", "message": "Invalid username or password"}), 400
 
+        # upgrade hashes made with an older method/cost now that we have the password
+        if needs_rehash(results['password']):
+            cursor.execute("update users set password = %s where user_id = %s",
+                           (hash_password(password), results["user_id"]))
+            conn.commit()
+
         # generate jwt token
         token = jwt.encode({
             "user_id":results["user_id"],
             "username":results['username'],
             "role":results["role"],
+            "jti":uuid.uuid4().hex,
             "exp":datetime.utcnow()+ timedelta(hours=2)
         }, current_app.config["SECRET_KEY"], algorithm="HS256")
 
@@ -108,8 +226,27 @@ def login_user():
             }
         ), 200
 
+    except HashQueueFull as e:
+        return jsonify({"status": "fail", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "fail", "message": str(e)}), 500
-    finally:
-        cursor.close()
-        close_connection(conn)
\ No newline at end of file
+
+# logout API: revoke the presented token until it expires
+@auth_bp.route("/logout", methods=["POST"])
+def logout_user():
+    claims = g.get('current_user')
+    if not claims or not claims.get('jti'):
+        return jsonify({"status": "Error", "message": "Token cannot be revoked"}), 400
+
+    try:
+        conn = get_db()
+        cursor = get_cursor()
+        cursor.execute("""
+        insert ignore into revoked_tokens(jti, expires_at)
+        values(%s, %s)""", (claims['jti'], datetime.utcfromtimestamp(claims['exp'])))
+        conn.commit()
+        revocations.add(claims['jti'])
+
+        return jsonify({"status": "success", "message": "logged out"}), 200
+    except Exception as e:
+        return jsonify({"status": "Error", "message": str(e)}), 500
@@ -1,6 +1,6 @@
 from flask import Blueprint
 from flask import Flask, request, jsonify, current_app
-from dbconn import create_connection, close_connection
+from dbconn import get_db, get_cursor, create_connection, close_connection
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask_cors import CORS
@@ -9,111 +9,308 @@ import calendar
 from calendar import month_name
 import json
 import os
+import statistics
+import threading
+import time
 from dotenv import load_dotenv
 
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+DASHBOARD_REFRESH_INTERVAL = float(os.getenv('DASHBOARD_REFRESH_INTERVAL', 60))
+DASHBOARD_MIN_REFRESH_INTERVAL = float(os.getenv('DASHBOARD_MIN_REFRESH_INTERVAL', 2))
+# Shared directory whose dashboard.stamp file carries invalidations to every
+# gunicorn worker; unset = writes only refresh this process's snapshot
+DASHBOARD_STATE_DIR = os.getenv('DASHBOARD_STATE_DIR', os.getenv('METRICS_MULTIPROC_DIR'))
+DASHBOARD_SYNC_INTERVAL = 1.0
 
+# Minimum percentage counted as a pass in the class performance report
+PASS_PERCENTAGE = 40
 
 
+class StatisticsSnapshot:
+    # Dashboard statistics computed off the request path. A daemon thread
+    # recomputes the snapshot every `interval` seconds, or sooner (but no more
+    # often than `min_interval`) after a write invalidates it. With a shared
+    # `directory`, an invalidation touches dashboard.stamp and every worker's
+    # thread notices the new mtime within DASHBOARD_SYNC_INTERVAL.
+
+    def __init__(self, interval, min_interval, directory=DASHBOARD_STATE_DIR):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._data = None
+        self._generated_at = None
+        self._refreshed_at = 0.0
+        self._stamp_seen = None
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0, 'invalidations': 0}
+
+    def get(self):
+        with self._lock:
+            if self._data is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+            return self._data, self._generated_at
+
+    def store(self, data):
+        with self._lock:
+            self._data = data
+            self._generated_at = datetime.now()
+            self.stats['refreshes'] += 1
+            return self._data, self._generated_at
+
+    def _stamp_path(self):
+        return os.path.join(self.directory, 'dashboard.stamp')
+
+    def _stamp(self):
+        if not self.directory:
+            return None
+        try:
+            return os.stat(self._stamp_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def invalidate(self):
+        self.stats['invalidations'] += 1
+        self.start()
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._stamp_path(), 'a'):
+                    pass
+                os.utime(self._stamp_path())
+            except OSError as e:
+                print(f"Dashboard invalidation stamp failed: {e}")
+        self._wake.set()
+
+    def start(self):
+        # Checked per pid so forked workers start their own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stamp_seen = self._stamp()
+            self._refreshed_at = time.monotonic()
+            threading.Thread(target=self._run, name="dashboard-refresher", daemon=True).start()
+
+    def refresh(self):
+        connection = create_connection()
+        if not connection:
+            self.stats['refresh_errors'] += 1
+            return
+        try:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                self.store(compute_dashboard_statistics(cursor))
+            finally:
+                cursor.close()
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            print(f"Dashboard statistics refresh failed: {e}")
+        finally:
+            close_connection(connection)
+
+    def _run(self):
+        while True:
+            woken = self._wake.wait(DASHBOARD_SYNC_INTERVAL if self.directory else self.interval)
+            self._wake.clear()
+            # Read before refreshing so a write during the refresh triggers another
+            stamp = self._stamp()
+            if woken or stamp != self._stamp_seen or time.monotonic() - self._refreshed_at >= self.interval:
+                self._stamp_seen = stamp
+                self.refresh()
+                self._refreshed_at = time.monotonic()
+                time.sleep(self.min_interval)
+
+
+statistics_snapshot = StatisticsSnapshot(DASHBOARD_REFRESH_INTERVAL, DASHBOARD_MIN_REFRESH_INTERVAL)
+
+
+def invalidate_dashboard_statistics():
+    statistics_snapshot.invalidate()
+
+
+def compute_dashboard_statistics(cursor):
+    # Total students
+    cursor.execute("SELECT COUNT(*) AS total_students FROM students")
+    total_students = cursor.fetchone()['total_students']
+
+    # New admissions in the last 30 days
+    cursor.execute("""
+        SELECT COUNT(*) AS new_admission_count
+        FROM students
+        WHERE enrollment_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+    """)
+    new_admission_count = cursor.fetchone()['new_admission_count']
+
+    # Pending fees
+    cursor.execute("""
+        SELECT COUNT(*) AS pending_fees
+        FROM students
+        WHERE fee_status = 'pending'
+    """)
+    pending_fees = cursor.fetchone()['pending_fees']
+
+    # Monthly admissions for the current year
+    cursor.execute("""
+        SELECT MONTH(enrollment_date) AS month, COUNT(*) AS count
+        FROM students
+        WHERE YEAR(enrollment_date) = YEAR(CURDATE())
+        GROUP BY MONTH(enrollment_date)
+    """)
+    monthly_admissions_raw = cursor.fetchall()
+    monthly_admissions = [
+        {"month": calendar.month_name[row['month']], "count": row['count']}
+        for row in monthly_admissions_raw
+    ]
+
+    # Recent payments (last 5)
+    cursor.execute("""
+        SELECT sf.student_id, s.full_name, sf.amount_paid, DATE(sf.payment_date) AS payment_date
+        FROM student_fees sf
+        JOIN students s ON sf.student_id = s.student_id
+        ORDER BY sf.payment_date DESC
+        LIMIT 5
+    """)
+    recent_payments = cursor.fetchall()
+
+    # Attendance summary for today
+    cursor.execute("SELECT CURDATE() AS today")
+    today = cursor.fetchone()['today']
+
+    cursor.execute("""
+        SELECT status, COUNT(*) AS count
+        FROM attendance
+        WHERE date = %s
+        GROUP BY status
+    """, (today,))
+    attendance_counts = cursor.fetchall()
+    total_attendance = sum(row['count'] for row in attendance_counts)
+    attendance_summary = {
+        "date": str(today),
+        "present_percentage": 0,
+        "absent_percentage": 0,
+        "late_percentage": 0
+    }
+    for row in attendance_counts:
+        percentage = (row['count'] / total_attendance) * 100 if total_attendance else 0
+        if row['status'] == 'present':
+            attendance_summary['present_percentage'] = round(percentage, 2)
+        elif row['status'] == 'absent':
+            attendance_summary['absent_percentage'] = round(percentage, 2)
+        elif row['status'] == 'late':
+            attendance_summary['late_percentage'] = round(percentage, 2)
+
+    return {
+        "total_students": total_students,
+        "new_admission_count": new_admission_count,
+        "pending_fees": pending_fees,
+        "monthly_admissions": monthly_admissions,
+        "recent_payments": recent_payments,
+        "attendance_summary": attendance_summary
+    }
+
 
 @dashboard_bp.route('/api/dashboard/statistics', methods=['GET'])
 def get_dashboard_statistics():
-    connection = create_connection()
-    if not connection:
-        return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
+    # Served from the snapshot; ?fresh=1 recomputes it on this request
+    statistics_snapshot.start()
+    data, generated_at = (None, None) if request.args.get('fresh') == '1' else statistics_snapshot.get()
 
-    try:
-        cursor = connection.cursor(dictionary=True)
+    if data is None:
+        connection = get_db()
+        if not connection:
+            return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
-        # Total students
-        cursor.execute("SELECT COUNT(*) AS total_students FROM students")
-        total_students = cursor.fetchone()['total_students']
+        try:
+            cursor = get_cursor(dictionary=True)
+            data, generated_at = statistics_snapshot.store(compute_dashboard_statistics(cursor))
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
 
-        # New admissions in the last 30 days
-        cursor.execute("""
-            SELECT COUNT(*) AS new_admission_count
-            FROM students
-            WHERE enrollment_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        """)
-        new_admission_count = cursor.fetchone()['new_admission_count']
+    return jsonify({
+        "status": "success",
+        "generated_at": generated_at.isoformat(),
+        "data": data
+    }), 200
 
-        # Pending fees
-        cursor.execute("""
-            SELECT COUNT(*) AS pending_fees
-            FROM students
-            WHERE fee_status = 'pending'
-        """)
-        pending_fees = cursor.fetchone()['pending_fees']
 
-        # Monthly admissions for the current year
-        cursor.execute("""
-            SELECT MONTH(enrollment_date) AS month, COUNT(*) AS count
-            FROM students
-            WHERE YEAR(enrollment_date) = YEAR(CURDATE())
-            GROUP BY MONTH(enrollment_date)
-        """)
-        monthly_admissions_raw = cursor.fetchall()
-        import calendar
-        monthly_admissions = [
-            {"month": calendar.month_name[row['month']], "count": row['count']}
-            for row in monthly_admissions_raw
-        ]
-
-        # Recent payments (last 5)
-        cursor.execute("""
-            SELECT sf.student_id, s.full_name, sf.amount_paid, DATE(sf.payment_date) AS payment_date
-            FROM student_fees sf
-            JOIN students s ON sf.student_id = s.student_id
-            ORDER BY sf.payment_date DESC
-            LIMIT 5
-        """)
-        recent_payments = cursor.fetchall()
-
-        # Attendance summary for today
-        cursor.execute("SELECT CURDATE() AS today")
-        today = cursor.fetchone()['today']
+def build_class_performance_report(rows):
+    # Reduce exam_results rows (one per student per subject) into every report
+    # section in a single pass
+    subjects = {}
+    students = {}
+    grade_distribution = {}
+    marks_total = 0.0
 
-        cursor.execute("""
-            SELECT status, COUNT(*) AS count
-            FROM attendance
-            WHERE date = %s
-            GROUP BY status
-        """, (today,))
-        attendance_counts = cursor.fetchall()
-        total_attendance = sum(row['count'] for row in attendance_counts)
-        attendance_summary = {
-            "date": str(today),
-            "present_percentage": 0,
-            "absent_percentage": 0,
-            "late_percentage": 0
+    for row in rows:
+        marks = float(row['marks_obtained'])
+        total = float(row['total_marks'])
+        marks_total += marks
+
+        subject = subjects.setdefault(row['subject_id'], {'subject': row['subject_name'], 'marks': 0.0, 'count': 0, 'passed': 0})
+        subject['marks'] += marks
+        subject['count'] += 1
+        if total and marks / total * 100 >= PASS_PERCENTAGE:
+            subject['passed'] += 1
+
+        student = students.setdefault(row['student_id'], {'full_name': row['full_name'], 'marks': 0.0, 'total': 0.0})
+        student['marks'] += marks
+        student['total'] += total
+
+        grade_distribution[row['grade']] = grade_distribution.get(row['grade'], 0) + 1
+
+    subject_averages = [
+        {
+            "subject": subject['subject'],
+            "average": round(subject['marks'] / subject['count'], 2),
+            "pass_rate": round(subject['passed'] / subject['count'] * 100, 2)
         }
-        for row in attendance_counts:
-            percentage = (row['count'] / total_attendance) * 100 if total_attendance else 0
-            if row['status'] == 'present':
-                attendance_summary['present_percentage'] = round(percentage, 2)
-            elif row['status'] == 'absent':
-                attendance_summary['absent_percentage'] = round(percentage, 2)
-            elif row['status'] == 'late':
-                attendance_summary['late_percentage'] = round(percentage, 2)
+        for _, subject in sorted(subjects.items())
+    ]
 
-        return jsonify({
-            "status": "success",
-            "data": {
-                "total_students": total_students,
-                "new_admission_count": new_admission_count,
-                "pending_fees": pending_fees,
-                "monthly_admissions": monthly_admissions,
-                "recent_payments": recent_payments,
-                "attendance_summary": attendance_summary
+    rankings = sorted(
+        (
+            {
+                "student_id": student_id,
+                "full_name": student['full_name'],
+                "percentage": round(student['marks'] / student['total'] * 100, 2) if student['total'] else 0
             }
-        }), 200
+            for student_id, student in students.items()
+        ),
+        key=lambda r: (-r['percentage'], r['student_id'])
+    )
+    # Competition ranking: ties share a rank, the next rank skips
+    for position, entry in enumerate(rankings, start=1):
+        if position > 1 and entry['percentage'] == rankings[position - 2]['percentage']:
+            entry['rank'] = rankings[position - 2]['rank']
+        else:
+            entry['rank'] = position
 
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
+    percentages = [r['percentage'] for r in rankings]
+    total_students = len(percentages)
+    # On the unrounded percentage, so 39.996 is not counted as a pass
+    passed_students = sum(1 for student in students.values()
+                          if student['total'] and student['marks'] / student['total'] * 100 >= PASS_PERCENTAGE)
+
+    return {
+        "subject_averages": subject_averages,
+        "top_performers": rankings[:5],
+        "grade_distribution": grade_distribution,
+        "overall_average": round(marks_total / len(rows), 2) if rows else 0,
+        "pass_percentage": round(passed_students / total_students * 100, 2) if total_students else 0,
+        "total_students": total_students,
+        "passed_students": passed_students,
+        "median_percentage": round(statistics.median(percentages), 2) if percentages else 0,
+        "std_dev_percentage": round(statistics.pstdev(percentages), 2) if percentages else 0,
+        "student_rankings": rankings
+    }
 
 
 @dashboard_bp.route('/api/reports/class-performance/<grade>', methods=['GET'])
@@ -122,12 +319,12 @@ def get_class_performance_report(grade):
     if not exam_id:
         return jsonify({'status': 'error', 'message': 'exam_id is required'}), 400
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor(dictionary=True)
+        cursor = get_cursor(dictionary=True)
 
         # Get exam name
         cursor.execute("SELECT exam_name FROM exams WHERE exam_id = %s", (exam_id,))
@@ -136,94 +333,25 @@ def get_class_performance_report(grade):
             return jsonify({'status': 'error', 'message': 'Exam not found'}), 404
         exam_name = exam['exam_name']
 
-        # Subject averages
+        # One fetch of the class's results; every section is derived from it
         cursor.execute("""
-            SELECT sub.subject_name AS subject, AVG(er.marks_obtained) AS average
+            SELECT s.student_id, s.full_name, er.subject_id, sub.subject_name AS subject_name,
+                   er.marks_obtained, er.total_marks, er.grade
             FROM exam_results er
             JOIN students s ON er.student_id = s.student_id
             JOIN subjects sub ON er.subject_id = sub.subject_id
             WHERE s.grade = %s AND er.exam_id = %s
-            GROUP BY er.subject_id
         """, (grade, exam_id))
-        subject_averages = cursor.fetchall()
-
-        # Top performers (top 5)
-        cursor.execute("""
-            SELECT s.student_id, s.full_name,
-                   (SUM(er.marks_obtained) / SUM(er.total_marks)) * 100 AS percentage
-            FROM exam_results er
-            JOIN students s ON er.student_id = s.student_id
-            WHERE s.grade = %s AND er.exam_id = %s
-            GROUP BY s.student_id
-            ORDER BY percentage DESC
-            LIMIT 5
-        """, (grade, exam_id))
-        top_performers = cursor.fetchall()
-
-        # Grade distribution
-        cursor.execute("""
-            SELECT er.grade, COUNT(*) AS count
-            FROM exam_results er
-            JOIN students s ON er.student_id = s.student_id
-            WHERE s.grade = %s AND er.exam_id = %s
-            GROUP BY er.grade
-        """, (grade, exam_id))
-        grade_counts = cursor.fetchall()
-        grade_distribution = {row['grade']: row['count'] for row in grade_counts}
-
-        # Overall average
-        cursor.execute("""
-            SELECT AVG(er.marks_obtained) AS overall_average
-            FROM exam_results er
-            JOIN students s ON er.student_id = s.student_id
-            WHERE s.grade = %s AND er.exam_id = %s
-        """, (grade, exam_id))
-        overall_average = cursor.fetchone()['overall_average']
-
-        # Pass percentage (assuming passing grade is not 'F')
-        cursor.execute("""
-            SELECT COUNT(*) AS total_students
-            FROM (
-                SELECT er.student_id,
-                       (SUM(er.marks_obtained) / SUM(er.total_marks)) * 100 AS percentage
-                FROM exam_results er
-                JOIN students s ON er.student_id = s.student_id
-                WHERE s.grade = %s AND er.exam_id = %s
-                GROUP BY er.student_id
-            ) AS student_percentages
-        """, (grade, exam_id))
-        total_students = cursor.fetchone()['total_students']
-
-        cursor.execute("""
-            SELECT COUNT(*) AS passed_students
-            FROM (
-                SELECT er.student_id,
-                       (SUM(er.marks_obtained) / SUM(er.total_marks)) * 100 AS percentage
-                FROM exam_results er
-                JOIN students s ON er.student_id = s.student_id
-                WHERE s.grade = %s AND er.exam_id = %s
-                GROUP BY er.student_id
-            ) AS student_percentages
-            WHERE percentage >= 40
-        """, (grade, exam_id))
-        passed_students = cursor.fetchone()['passed_students']
-
-        pass_percentage = (passed_students / total_students) * 100 if total_students else 0
+        report = build_class_performance_report(cursor.fetchall())
 
         return jsonify({
             "status": "success",
             "data": {
                 "grade": grade,
                 "exam_name": exam_name,
-                "subject_averages": subject_averages,
-                "top_performers": top_performers,
-                "grade_distribution": grade_distribution,
-                "overall_average": round(overall_average, 2) if overall_average else 0,
-                "pass_percentage": round(pass_percentage, 2)
+                **report
             }
         }), 200
 
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
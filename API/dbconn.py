@@ -1,41 +1,284 @@
 import os
+import threading
+import time
+from collections import deque
 import mysql.connector
 from mysql.connector import Error
+from flask import g
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-def create_connection():
-    try:
-        # Retrieve database credentials from environment variables
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USERNAME', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'Rajubay@123'),
-            'database': os.getenv('DB_NAME', 'sms')
+# Pool settings
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+POOL_MAX_IDLE_TIME = float(os.getenv('DB_POOL_MAX_IDLE_TIME', 300))
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+
+def _db_config():
+    # Retrieve database credentials from environment variables
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USERNAME', 'root'),
+        'password': os.getenv('DB_PASSWORD', 'Rajubay@123'),
+        'database': os.getenv('DB_NAME', 'sms')
+    }
+
+
+# Optional callable wrapping every cursor handed out by a pooled connection
+# (installed by instrumentation.py; dbconn itself imports nothing from it)
+_cursor_wrapper = None
+
+
+def set_cursor_wrapper(wrapper):
+    global _cursor_wrapper
+    _cursor_wrapper = wrapper
+
+
+class PooledConnection:
+    # Thin proxy around a MySQL connection; close() hands it back to the pool
+    # instead of tearing down the socket.
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out = True
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        return _cursor_wrapper(cursor) if _cursor_wrapper else cursor
+
+    def is_connected(self):
+        return self._checked_out and self._raw.is_connected()
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool.release(self._raw)
+
+    def discard(self):
+        # For a connection left in the middle of a result set: drop it
+        # without the rollback in release(), which would read the rest first
+        if self._checked_out:
+            self._checked_out = False
+            self._pool.release(self._raw, discard=True)
+
+
+class ConnectionPool:
+    def __init__(self, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, timeout=POOL_TIMEOUT,
+                 max_idle_time=POOL_MAX_IDLE_TIME, pre_ping=POOL_PRE_PING):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_idle_time = max_idle_time
+        self.pre_ping = pre_ping
+
+        self._idle = deque()  # (connection, returned_at)
+        self._opened = 0
+        self._checked_out = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'discarded': 0,
+            'ping_failures': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0
         }
-        
-        # Optional: Add additional connection parameters
+
+    def _connect(self):
         connection = mysql.connector.connect(
-            **db_config,
+            **_db_config(),
             # Optional additional parameters
             # charset='utf8mb4',
             # connection_timeout=180
         )
-        
-        if connection.is_connected():
-            print("Successfully connected to MySQL database")
-            return connection
-    
+        self._stats['connects'] += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+        self._stats['discarded'] += 1
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._cond:
+            while True:
+                # Reuse an idle connection, dropping any that sat too long
+                while self._idle:
+                    connection, returned_at = self._idle.pop()
+                    if time.monotonic() - returned_at > self.max_idle_time:
+                        self._opened -= 1
+                        self._discard(connection)
+                        continue
+                    break
+                else:
+                    connection = None
+
+                if connection is not None or self._opened < self.size + self.max_overflow:
+                    if connection is None:
+                        self._opened += 1
+                    self._checked_out += 1
+                    self._stats['checkouts'] += 1
+                    self._stats['wait_time_total'] += time.monotonic() - started
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise Error(msg="Timed out waiting for a pooled MySQL connection")
+                self._cond.wait(remaining)
+
+        # Network work happens outside the lock
+        try:
+            if connection is None:
+                connection = self._connect()
+            elif self.pre_ping:
+                try:
+                    connection.ping(reconnect=False)
+                except Error:
+                    self._stats['ping_failures'] += 1
+                    self._discard(connection)
+                    connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, connection)
+
+    def release(self, connection, discard=False):
+        healthy = not discard
+        try:
+            if discard:
+                # Closes the socket without sending QUIT or reading pending rows
+                connection.shutdown()
+            # Never hand the next request a half-finished transaction
+            elif connection.is_connected():
+                connection.rollback()
+            else:
+                healthy = False
+        except Error:
+            healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._opened -= 1
+                self._discard(connection)
+            self._cond.notify()
+
+    def dispose(self):
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._opened -= 1
+                self._discard(connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'overflow': max(0, self._opened - self.size),
+                **self._stats
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def create_connection():
+    try:
+        return get_pool().acquire()
+
     except Error as e:
         print(f"Error while connecting to MySQL: {e}")
         return None
 
+def create_unpooled_connection(**kwargs):
+    # Plain connection outside the pool (and so never instrumented), for
+    # background diagnostics and scripts that must not compete with requests
+    return mysql.connector.connect(**_db_config(), **kwargs)
+
 def close_connection(connection):
-    if connection and connection.is_connected():
+    # Pooled connections go back to the pool even if the socket dropped,
+    # so the pool can account for (and replace) them
+    if isinstance(connection, PooledConnection):
+        connection.close()
+    elif connection and connection.is_connected():
         connection.close()
-        print("MySQL connection closed")
+
+# Request-scoped connection: acquired lazily on first use, shared by every
+# query the handler issues and handed back to the pool on app context teardown
+def get_db():
+    if 'db_conn' not in g:
+        g.db_conn = create_connection()
+        g.db_cursors = []
+    return g.db_conn
+
+def get_cursor(**kwargs):
+    connection = get_db()
+    if connection is None:
+        raise Error(msg="Database connection failed")
+    cursor = connection.cursor(**kwargs)
+    g.db_cursors.append(cursor)
+    return cursor
+
+def release_db(exception=None):
+    connection = g.pop('db_conn', None)
+    for cursor in g.pop('db_cursors', []):
+        try:
+            cursor.close()
+        except Error:
+            pass
+    close_connection(connection)
+
+def discard_db():
+    # Drop the request's connection instead of returning it to the pool; its
+    # cursors are left unclosed since closing them would read unfetched rows
+    connection = g.pop('db_conn', None)
+    g.pop('db_cursors', None)
+    if isinstance(connection, PooledConnection):
+        connection.discard()
+    elif connection:
+        connection.shutdown()
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
 
 # Optional: Add a connection test function
 def test_connection():
@@ -43,6 +286,7 @@ def test_connection():
     if conn:
         print("Connection successful!")
         close_connection(conn)
+        print(pool_stats())
         return True
     else:
         print("Connection failed!")
@@ -72,7 +316,7 @@ if __name__ == '__main__':
 #     except Error as e:
 #         print(f"Error while connecting to mysql: {e}")
 #         return None
-    
+
 # def close_connection(connection):
 #     if connection and connection.is_connected():
-#         connection.close()
\ No newline at end of file
+#         connection.close()
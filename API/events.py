@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Events kept for Last-Event-ID resume, and per-subscriber queue bound
+SSE_HISTORY_SIZE = int(os.getenv('SSE_HISTORY_SIZE', 1000))
+SSE_BUFFER_SIZE = int(os.getenv('SSE_BUFFER_SIZE', 100))
+SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', 1000))
+
+# Delivered to a subscriber that may have missed events (buffer overflow or a
+# Last-Event-ID older than the history); the client should refetch its inbox
+RESET = object()
+
+
+class Subscription:
+    def __init__(self, broker, tags, buffer_size):
+        self.tags = frozenset(tags)
+        self._broker = broker
+        self._buffer_size = buffer_size
+        self._queue = deque()
+        self._overflowed = False
+        self._cond = threading.Condition()
+
+    def push(self, event):
+        with self._cond:
+            if len(self._queue) >= self._buffer_size:
+                # Slow client: drop what it has not read and tell it to resync
+                self._queue.clear()
+                self._overflowed = True
+            else:
+                self._queue.append(event)
+            self._cond.notify()
+
+    def get(self, timeout):
+        # Next event, RESET, or None if nothing arrived within timeout
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._overflowed, timeout)
+            if self._overflowed:
+                self._overflowed = False
+                return RESET
+            return self._queue.popleft() if self._queue else None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class NotificationBroker:
+    # In-process pub/sub. Events carry a set of audience tags such as
+    # ('student', 12) or ('students', '5'); a subscriber receives every event
+    # sharing at least one tag with its own set.
+
+    def __init__(self, history_size=SSE_HISTORY_SIZE, buffer_size=SSE_BUFFER_SIZE,
+                 max_subscribers=SSE_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._evicted_up_to = 0
+        self.stats = {'published': 0, 'delivered': 0}
+
+    def publish(self, event_id, payload, tags):
+        event = (event_id, payload, frozenset(tags))
+        with self._lock:
+            if len(self._history) == self._history.maxlen:
+                self._evicted_up_to = self._history[0][0]
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            self.stats['published'] += 1
+
+        for subscription in subscribers:
+            if subscription.tags & event[2]:
+                subscription.push(event)
+                self.stats['delivered'] += 1
+
+    def subscribe(self, tags, last_event_id=None):
+        subscription = Subscription(self, tags, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                if last_event_id < self._evicted_up_to:
+                    subscription.push(RESET)
+                for event in self._history:
+                    if event[0] > last_event_id and subscription.tags & event[2]:
+                        subscription.push(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+notification_broker = NotificationBroker()
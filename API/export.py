@@ -0,0 +1,142 @@
+from flask import Blueprint
+from flask import request, jsonify, current_app, Response, stream_with_context
+from dbconn import get_cursor, discard_db
+from datetime import datetime, timedelta
+from contextlib import closing
+import csv
+import io
+import os
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+export_bp = Blueprint("export", __name__)
+
+# Rows pulled from the server-side cursor per fetchmany()/yield
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def _date_range():
+    # Inclusive start_date/end_date as a half-open range
+    start_date = datetime.strptime(request.args.get('start_date', ''), '%Y-%m-%d')
+    end_date = datetime.strptime(request.args.get('end_date', ''), '%Y-%m-%d')
+    return start_date, end_date + timedelta(days=1)
+
+
+def _stream_export(name, query, params):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+
+    try:
+        # Unbuffered cursor: rows stay on the server until fetched, so memory
+        # is bounded by one batch however large the export is
+        cursor = get_cursor(buffered=False, dictionary=export_format == 'ndjson')
+        cursor.execute(query, params)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    json_provider = current_app.json
+
+    def encode_batches():
+        finished = False
+        try:
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(cursor.column_names)
+                yield buffer.getvalue().encode('utf-8')
+
+            while True:
+                batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                if export_format == 'csv':
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(batch)
+                    yield buffer.getvalue().encode('utf-8')
+                else:
+                    yield ''.join(json_provider.dumps(row) + '\n' for row in batch).encode('utf-8')
+            finished = True
+        finally:
+            # A client that disconnects mid-export (or a failed fetch) leaves
+            # unread rows on the connection. Returning it to the pool would
+            # roll back, which reads every remaining row first, so close it.
+            if not finished:
+                discard_db()
+
+    def generate():
+        if not compress:
+            yield from encode_batches()
+            return
+        # gzip container (wbits=31), flushed per batch so bytes go out at once
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        with closing(encode_batches()) as batches:
+            for chunk in batches:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{name}.{export_format}"',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+
+@export_bp.route('/api/export/students', methods=['GET'])
+def export_students():
+    grade = request.args.get('grade')
+    query = """
+        SELECT student_id, full_name, date_of_birth, gender, email, phone, address,
+               grade, fee_status, total_fee, status, enrollment_date
+        FROM students
+    """
+    params = ()
+    if grade:
+        query += " WHERE grade = %s"
+        params = (grade,)
+    return _stream_export('students', query + " ORDER BY student_id", params)
+
+
+@export_bp.route('/api/export/attendance', methods=['GET'])
+def export_attendance():
+    try:
+        range_start, range_end = _date_range()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'start_date and end_date (YYYY-MM-DD) are required'}), 400
+
+    query = """
+        SELECT a.date, a.student_id, s.full_name, s.grade, a.status, a.remarks
+        FROM attendance a
+        JOIN students s ON s.student_id = a.student_id
+        WHERE a.date >= %s AND a.date < %s
+    """
+    params = [range_start.date(), range_end.date()]
+    if request.args.get('grade'):
+        query += " AND s.grade = %s"
+        params.append(request.args.get('grade'))
+    return _stream_export('attendance', query + " ORDER BY a.date", params)
+
+
+@export_bp.route('/api/export/fees', methods=['GET'])
+def export_fees():
+    try:
+        range_start, range_end = _date_range()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'start_date and end_date (YYYY-MM-DD) are required'}), 400
+
+    query = """
+        SELECT sf.fee_id, sf.student_id, s.full_name, s.grade, sf.amount_paid, sf.total_fee,
+               sf.fee_status, sf.payment_method, sf.payment_date, sf.remarks
+        FROM student_fees sf
+        JOIN students s ON s.student_id = sf.student_id
+        WHERE sf.payment_date >= %s AND sf.payment_date < %s
+        ORDER BY sf.payment_date
+    """
+    return _stream_export('fees', query, (range_start, range_end))
@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Blueprint, request, jsonify, g, has_request_context
+import dbconn
+from jwt_auth import roles_required
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Histogram bucket upper bounds in milliseconds (a final +Inf bucket is implied)
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Optional recorder for statements slower than its threshold_ms (installed by
+# slow_queries.py)
+slow_query_recorder = None
+
+
+def set_slow_query_recorder(recorder):
+    global slow_query_recorder
+    slow_query_recorder = recorder
+
+
+class Histogram:
+    # Fixed-bucket histogram; percentiles are interpolated within a bucket so
+    # memory stays constant however many observations are recorded
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def state(self):
+        return {'counts': list(self.counts), 'count': self.count, 'sum': self.sum, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls()
+        histogram.counts = list(state['counts'])
+        histogram.count = state['count']
+        histogram.sum = state['sum']
+        histogram.max = state['max']
+        return histogram
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return round(min(lower + (upper - lower) * (rank - cumulative) / count, self.max), 3)
+            cumulative += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.sum / self.count, 3) if self.count else None,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3)
+        }
+
+
+class RouteMetrics:
+    def __init__(self, blueprint=None):
+        self.blueprint = blueprint
+        self.latency = Histogram()
+        self.db_latency = Histogram()
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.rows = 0
+        self.response_bytes = 0
+
+    def summary(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency': self.latency.summary(),
+            'db_latency': self.db_latency.summary(),
+            'avg_queries': round(self.queries / requests, 2),
+            'avg_rows': round(self.rows / requests, 2),
+            'avg_response_bytes': round(self.response_bytes / requests, 1)
+        }
+
+    def state(self):
+        return {
+            'blueprint': self.blueprint,
+            'requests': self.requests,
+            'errors': self.errors,
+            'queries': self.queries,
+            'rows': self.rows,
+            'response_bytes': self.response_bytes,
+            'latency': self.latency.state(),
+            'db_latency': self.db_latency.state()
+        }
+
+
+class MetricsRegistry:
+    # Per-route request metrics plus a latency histogram of every SQL
+    # statement (including ones issued outside a request by background jobs)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.query_latency = Histogram()
+
+    def observe_request(self, route, blueprint, wall_ms, db_ms, queries, rows, response_bytes, status):
+        with self._lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics(blueprint)
+            metrics.latency.observe(wall_ms)
+            metrics.db_latency.observe(db_ms)
+            metrics.requests += 1
+            metrics.errors += status >= 500
+            metrics.queries += queries
+            metrics.rows += rows
+            metrics.response_bytes += response_bytes
+
+    def observe_query(self, duration_ms):
+        with self._lock:
+            self.query_latency.observe(duration_ms)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'routes': {route: metrics.summary() for route, metrics in sorted(self.routes.items())},
+                'queries': self.query_latency.summary()
+            }
+
+    def state(self):
+        # Raw counters for the Prometheus exporter (see prometheus.py)
+        with self._lock:
+            return {
+                'routes': {route: metrics.state() for route, metrics in self.routes.items()},
+                'query_latency': self.query_latency.state()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+            self.query_latency = Histogram()
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentedCursor:
+    # Proxy around a MySQL cursor timing execute/fetch calls and counting
+    # rows, charged to the current request when there is one
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # Slow-query entry for the last statement; later fetches add its rows
+        self._slow_entry = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _record(self, started, rows=0, query=False):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if query:
+            registry.observe_query(elapsed_ms)
+        if has_request_context():
+            request_stats = g.get('request_stats')
+            if request_stats is not None:
+                request_stats['db_ms'] += elapsed_ms
+                request_stats['queries'] += query
+                request_stats['rows'] += rows
+        if rows and self._slow_entry is not None:
+            self._slow_entry['rows'] += rows
+        return elapsed_ms
+
+    def _record_query(self, started, operation, params):
+        self._slow_entry = None
+        elapsed_ms = self._record(started, query=True)
+        recorder = slow_query_recorder
+        if recorder is not None and elapsed_ms >= recorder.threshold_ms:
+            self._slow_entry = recorder.record(operation, params, elapsed_ms)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record_query(started, operation, params)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._record_query(started, operation, seq_params[0] if seq_params else None)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._record(started, rows=row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._record(started, rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._record(started, rows=len(rows))
+        return rows
+
+
+def route_name():
+    return f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}"
+
+
+def start_request():
+    g.request_stats = {'started': time.perf_counter(), 'db_ms': 0.0, 'queries': 0, 'rows': 0}
+
+
+def finish_request(response):
+    request_stats = g.pop('request_stats', None)
+    if request_stats is None:
+        return response
+    # Streamed responses (exports, SSE) are measured up to the first byte;
+    # their length is unknown here and counted as 0
+    wall_ms = (time.perf_counter() - request_stats['started']) * 1000
+    response_bytes = 0 if response.is_streamed else (response.content_length or 0)
+    registry.observe_request(route_name(), request.blueprint or 'app', wall_ms, request_stats['db_ms'], request_stats['queries'],
+                             request_stats['rows'], response_bytes, response.status_code)
+
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = (
+            f'app;dur={wall_ms:.1f}, '
+            f'db;dur={request_stats["db_ms"]:.1f};desc="{request_stats["queries"]} queries, {request_stats["rows"]} rows"'
+        )
+    return response
+
+
+def init_app(app):
+    if not INSTRUMENTATION_ENABLED:
+        return
+    dbconn.set_cursor_wrapper(InstrumentedCursor)
+    # Registered before auth so its before_request runs first and the
+    # token check is included in the wall time
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+
+# Per-route latency summary for this worker; ?reset=1 clears it
+@metrics_bp.route('/api/metrics/routes', methods=['GET'])
+@roles_required('admin')
+def route_metrics():
+    summary = registry.summary()
+    if request.args.get('reset') in ('1', 'true'):
+        registry.reset()
+    return jsonify({"status": "success", "data": summary}), 200
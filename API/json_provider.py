@@ -0,0 +1,66 @@
+import decimal
+import json
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from flask.json.provider import JSONProvider
+from dotenv import load_dotenv
+
+# orjson is optional; without it the stdlib encoder is used with the same output
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+load_dotenv()
+
+# Emit DECIMAL columns as exact strings, as Flask's default provider does;
+# 'false' sends them as floats
+JSON_DECIMAL_AS_STRING = os.getenv('JSON_DECIMAL_AS_STRING', 'true').lower() in ('1', 'true', 'yes')
+
+
+class FastJSONProvider(JSONProvider):
+    # JSON provider for cursor(dictionary=True) rows: Decimal, date, datetime
+    # and time values are encoded natively (ISO 8601 dates), output is always
+    # compact, keys are not sorted and orjson is used when installed.
+
+    mimetype = "application/json"
+    decimal_as_string = JSON_DECIMAL_AS_STRING
+
+    def _default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return str(o) if self.decimal_as_string else float(o)
+        if isinstance(o, (datetime, date, time)):
+            return o.isoformat()
+        if isinstance(o, timedelta):
+            # MySQL TIME columns come back as timedelta
+            return str(o)
+        if isinstance(o, (bytes, bytearray)):
+            return o.decode('utf-8', 'replace')
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    def dumps_bytes(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=self._default, option=orjson.OPT_NON_STR_KEYS)
+        return self.dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self._default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        kwargs.setdefault('default', self._default)
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from flask import request, jsonify, current_app, g
+from dbconn import create_connection, close_connection
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JWT_AUTH_ENABLED = os.getenv('JWT_AUTH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+REVOCATION_REFRESH_INTERVAL = float(os.getenv('REVOCATION_REFRESH_INTERVAL', 30))
+
+
+# Route decorators
+def public(view):
+    view._public = True
+    return view
+
+
+def roles_required(*roles):
+    def decorator(view):
+        view._required_roles = frozenset(roles)
+        return view
+    return decorator
+
+
+def token_in_query(view):
+    # For clients that cannot set headers (EventSource): accept ?access_token=
+    view._token_in_query = True
+    return view
+
+
+class TokenCache:
+    # Bounded LRU of verified claims keyed by sha256(token), each entry valid
+    # until the token's own exp
+
+    def __init__(self, size=TOKEN_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, claims):
+        with self._lock:
+            self._entries[key] = (claims, claims.get('exp', float('inf')))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RevocationList:
+    # Revoked token ids (jti), loaded from revoked_tokens once per worker and
+    # then reloaded every REVOCATION_REFRESH_INTERVAL seconds by a background
+    # thread, so requests only read the set; local revocations apply at once
+
+    def __init__(self, interval=REVOCATION_REFRESH_INTERVAL):
+        self.interval = interval
+        self._revoked = frozenset()
+        self._local = set()
+        self._pid = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _load(self):
+        connection = create_connection()
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT jti FROM revoked_tokens WHERE expires_at > UTC_TIMESTAMP()")
+            revoked = frozenset(row[0] for row in cursor.fetchall())
+            cursor.close()
+            return revoked
+        except Exception as e:
+            print(f"Token revocation refresh failed: {e}")
+            return None
+        finally:
+            close_connection(connection)
+
+    def refresh(self):
+        revoked = self._load()
+        if revoked is None:
+            return
+        with self._lock:
+            self._revoked = revoked
+            # Tokens revoked here after the SELECT are not in it yet; keep them
+            self._local -= revoked
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+    def ensure_started(self):
+        # The first load runs on the request that needs it; later ones in
+        # the background. Checked per pid so forked workers start their own.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.refresh()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="revocation-refresh", daemon=True).start()
+
+    def add(self, jti):
+        with self._lock:
+            self._local.add(jti)
+
+    def __contains__(self, jti):
+        return jti in self._revoked or jti in self._local
+
+
+token_cache = TokenCache()
+revocations = RevocationList()
+
+
+def verify_token(token):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            return None
+        token_cache.put(key, claims)
+
+    revocations.ensure_started()
+    if claims.get('jti') in revocations:
+        return None
+    return claims
+
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    return header[7:] if header.startswith('Bearer ') else None
+
+
+def authenticate():
+    if not JWT_AUTH_ENABLED or request.method == 'OPTIONS' or request.endpoint is None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, '_public', False):
+        return None
+
+    token = bearer_token()
+    if token is None and getattr(view, '_token_in_query', False):
+        token = request.args.get('access_token')
+    if not token:
+        return jsonify({"status": "error", "message": "Authorization token is required"}), 401
+
+    claims = verify_token(token)
+    if claims is None:
+        return jsonify({"status": "error", "message": "Invalid or expired token"}), 401
+
+    required_roles = getattr(view, '_required_roles', None)
+    if required_roles and claims.get('role') not in required_roles:
+        return jsonify({"status": "error", "message": "Insufficient permissions"}), 403
+
+    g.current_user = claims
+    return None
+
+
+def init_app(app):
+    app.before_request(authenticate)
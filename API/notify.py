@@ -1,6 +1,9 @@
 from flask import Blueprint
 from flask import Flask, request, jsonify, current_app
-from dbconn import create_connection, close_connection
+from flask import Response
+from dbconn import get_db, get_cursor, release_db
+from events import notification_broker, RESET
+from jwt_auth import token_in_query
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from flask_cors import CORS
@@ -14,6 +17,47 @@ from dotenv import load_dotenv
 
 notify_bp = Blueprint("notify", __name__)
 
+BULK_AUDIENCES = ('students', 'parents', 'both')
+RECIPIENT_TYPES = ('user', 'student', 'parent')
+NOTIFICATIONS_PAGE_SIZE = 20
+NOTIFICATIONS_MAX_PAGE_SIZE = 100
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', 15))
+
+
+def _requested_recipients(values):
+    # (recipient_type, recipient_id) pairs named by user_id/student_id/parent_id
+    return [(recipient_type, values.get(f'{recipient_type}_id'))
+            for recipient_type in RECIPIENT_TYPES if values.get(f'{recipient_type}_id')]
+
+
+def _insert_message(cursor, title, message, notif_type):
+    cursor.execute("""
+        INSERT INTO notification_messages (title, message, type)
+        VALUES (%s, %s, %s)
+    """, (title, message, notif_type))
+    return cursor.lastrowid
+
+
+def _publish(message_id, title, message, notif_type, tags):
+    # Push a committed message to live /api/notifications/stream subscribers
+    notification_broker.publish(message_id, {
+        'message_id': message_id,
+        'title': title,
+        'message': message,
+        'type': notif_type,
+        'created_at': datetime.now().isoformat()
+    }, tags)
+
+
+def _count_unread(cursor, message_id):
+    # Bump the unread counter of every recipient of a freshly sent message
+    cursor.execute("""
+        INSERT INTO notification_unread_counts (recipient_type, recipient_id, unread_count)
+        SELECT recipient_type, recipient_id, 1
+        FROM notification_recipients
+        WHERE message_id = %s
+        ON DUPLICATE KEY UPDATE unread_count = unread_count + 1
+    """, (message_id,))
 
 
 @notify_bp.route('/api/notifications', methods=['POST'])
@@ -22,29 +66,30 @@ def send_notification():
     title = data.get('title')
     message = data.get('message')
     notif_type = data.get('type', 'info')
-    student_id = data.get('student_id')
-    user_id = data.get('user_id')
+    recipients = _requested_recipients(data)
 
-    if not title or not message or (not student_id and not user_id):
+    if not title or not message or not recipients:
         return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
-        query = """
-            INSERT INTO notifications (title, message, type, student_id, user_id)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (title, message, notif_type, student_id, user_id))
+        cursor = get_cursor()
+        message_id = _insert_message(cursor, title, message, notif_type)
+        cursor.execute(f"""
+            INSERT INTO notification_recipients (message_id, recipient_type, recipient_id)
+            VALUES {", ".join(["(%s, %s, %s)"] * len(recipients))}
+        """, [value for recipient in recipients for value in (message_id, *recipient)])
+        _count_unread(cursor, message_id)
         connection.commit()
+        _publish(message_id, title, message, notif_type,
+                 [(recipient_type, int(recipient_id)) for recipient_type, recipient_id in recipients])
         return jsonify({'status': 'success', 'message': 'Notification sent successfully'}), 201
     except Exception as e:
+        connection.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
 
 @notify_bp.route('/api/notifications/bulk', methods=['POST'])
 def send_bulk_notification():
@@ -52,71 +97,275 @@ def send_bulk_notification():
     title = data.get('title')
     message = data.get('message')
     notif_type = data.get('type', 'info')
-    grade = data.get('grade')
+    # grade may be repeated or comma separated; all_students=1 targets everyone
+    grades = [grade.strip() for value in data.getlist('grade') for grade in value.split(',') if grade.strip()]
+    all_students = data.get('all_students') in ('1', 'true')
+    audience = data.get('audience', 'students')
 
-    if not title or not message or not grade:
+    if not title or not message or (not grades and not all_students):
         return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
+    if audience not in BULK_AUDIENCES:
+        return jsonify({'status': 'error', 'message': f"audience must be one of {', '.join(BULK_AUDIENCES)}"}), 400
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor()
+        cursor = get_cursor()
 
-        # Get students in the specified grade
-        cursor.execute("SELECT student_id FROM students WHERE grade = %s", (grade,))
-        students = cursor.fetchall()
+        if all_students:
+            student_filter, filter_params = "", ()
+        else:
+            student_filter = f"WHERE s.grade IN ({', '.join(['%s'] * len(grades))})"
+            filter_params = tuple(grades)
 
-        if not students:
-            return jsonify({'status': 'error', 'message': 'No students found in the specified grade'}), 404
+        # The message body is written once; the fan-out only writes narrow
+        # recipient rows, one INSERT ... SELECT per audience
+        message_id = _insert_message(cursor, title, message, notif_type)
 
-        # Bulk insert notifications
-        query = """
-            INSERT INTO notifications (title, message, type, student_id)
-            VALUES (%s, %s, %s, %s)
-        """
-        for student in students:
-            cursor.execute(query, (title, message, notif_type, student[0]))
+        recipient_count = 0
+        if audience in ('students', 'both'):
+            cursor.execute(f"""
+                INSERT INTO notification_recipients (message_id, recipient_type, recipient_id)
+                SELECT %s, 'student', s.student_id
+                FROM students s
+                {student_filter}
+            """, (message_id,) + filter_params)
+            recipient_count += cursor.rowcount
+
+        if audience in ('parents', 'both'):
+            cursor.execute(f"""
+                INSERT INTO notification_recipients (message_id, recipient_type, recipient_id)
+                SELECT DISTINCT %s, 'parent', sp.parent_id
+                FROM student_parent sp
+                JOIN students s ON s.student_id = sp.student_id
+                {student_filter}
+            """, (message_id,) + filter_params)
+            recipient_count += cursor.rowcount
 
+        if not recipient_count:
+            connection.rollback()
+            return jsonify({'status': 'error', 'message': 'No recipients found for the specified grade'}), 404
+
+        _count_unread(cursor, message_id)
         connection.commit()
+
+        # Subscribers are tagged with their grade, see stream_notifications
+        audiences = ('students', 'parents') if audience == 'both' else (audience,)
+        _publish(message_id, title, message, notif_type,
+                 [(group, grade) for group in audiences for grade in (['*'] if all_students else grades)])
         return jsonify({
             'status': 'success',
             'message': 'Bulk notification sent successfully',
-            'data': {'recipient_count': len(students)}
+            'data': {'message_id': message_id, 'recipient_count': recipient_count}
         }), 200
     except Exception as e:
+        connection.rollback()
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        close_connection(connection)
+
 @notify_bp.route('/api/notifications', methods=['GET'])
 def get_notifications():
-    user_id = request.args.get('user_id')
-    student_id = request.args.get('student_id')
+    # Newest first, paged with ?before=<next_cursor>&limit=N
+    recipients = _requested_recipients(request.args)
+    unread_only = request.args.get('unread_only') in ('1', 'true')
+    try:
+        limit = min(int(request.args.get('limit', NOTIFICATIONS_PAGE_SIZE)), NOTIFICATIONS_MAX_PAGE_SIZE)
+        before = int(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'limit and before must be integers'}), 400
+    if limit < 1:
+        return jsonify({'status': 'error', 'message': 'limit must be positive'}), 400
 
-    if not user_id and not student_id:
-        return jsonify({'status': 'error', 'message': 'user_id or student_id is required'}), 400
+    if not recipients:
+        return jsonify({'status': 'error', 'message': 'user_id, student_id or parent_id is required'}), 400
 
-    connection = create_connection()
+    connection = get_db()
     if not connection:
         return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-            SELECT notification_id, title, message, type, is_read, created_at
-            FROM notifications
-            WHERE user_id = %s OR student_id = %s
-            ORDER BY created_at DESC
+        cursor = get_cursor(dictionary=True)
+
+        # One inbox index range scan per recipient, merged, instead of an OR
+        conditions = "r.recipient_type = %s AND r.recipient_id = %s"
+        if unread_only:
+            conditions += " AND r.is_read = 0"
+        if before is not None:
+            conditions += " AND r.notification_id < %s"
+        branch = f"""(
+            SELECT r.notification_id, r.message_id, r.is_read, r.read_at
+            FROM notification_recipients r
+            WHERE {conditions}
+            ORDER BY r.notification_id DESC
+            LIMIT %s
+        )"""
+        params = []
+        for recipient in recipients:
+            params.extend(recipient)
+            if before is not None:
+                params.append(before)
+            params.append(limit + 1)
+
+        query = f"""
+            SELECT r.notification_id, r.message_id, m.title, m.message, m.type, r.is_read, r.read_at, m.created_at
+            FROM ({" UNION ALL ".join([branch] * len(recipients))}) r
+            JOIN notification_messages m ON m.message_id = r.message_id
+            ORDER BY r.notification_id DESC
+            LIMIT %s
         """
-        cursor.execute(query, (user_id, student_id))
+        cursor.execute(query, params + [limit + 1])
         notifications = cursor.fetchall()
 
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = notifications[-1]['notification_id']
+
         for n in notifications:
             n['is_read'] = bool(n['is_read'])  # convert tinyint to boolean
 
-        return jsonify({'status': 'success', 'data': notifications}), 200
+        return jsonify({'status': 'success', 'data': notifications, 'next_cursor': next_cursor}), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@notify_bp.route('/api/notifications/unread_count', methods=['GET'])
+def get_unread_count():
+    recipients = _requested_recipients(request.args)
+    if not recipients:
+        return jsonify({'status': 'error', 'message': 'user_id, student_id or parent_id is required'}), 400
+
+    connection = get_db()
+    if not connection:
+        return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
+
+    try:
+        cursor = get_cursor(dictionary=True)
+        cursor.execute(f"""
+            SELECT recipient_type, recipient_id, unread_count
+            FROM notification_unread_counts
+            WHERE {" OR ".join(["(recipient_type = %s AND recipient_id = %s)"] * len(recipients))}
+        """, [value for recipient in recipients for value in recipient])
+        counts = {f"{row['recipient_type']}_id": row['unread_count'] for row in cursor.fetchall()}
+
+        by_recipient = {f"{recipient_type}_id": counts.get(f"{recipient_type}_id", 0) for recipient_type, _ in recipients}
+        return jsonify({
+            'status': 'success',
+            'data': {'unread_count': sum(by_recipient.values()), 'by_recipient': by_recipient}
+        }), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@notify_bp.route('/api/notifications/read', methods=['POST'])
+def mark_notifications_read():
+    # notification_id may be repeated or comma separated; all=1 marks the whole inbox
+    data = request.form
+    recipients = _requested_recipients(data)
+    mark_all = data.get('all') in ('1', 'true')
+    try:
+        notification_ids = [int(n) for value in data.getlist('notification_id') for n in value.split(',') if n.strip()]
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'notification_id must be an integer'}), 400
+
+    if not recipients or (not notification_ids and not mark_all):
+        return jsonify({'status': 'error', 'message': 'A recipient and notification_id (or all=1) are required'}), 400
+
+    connection = get_db()
+    if not connection:
+        return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
+
+    try:
+        cursor = get_cursor()
+        marked = 0
+        for recipient in recipients:
+            query = """
+                UPDATE notification_recipients
+                SET is_read = 1, read_at = NOW()
+                WHERE recipient_type = %s AND recipient_id = %s AND is_read = 0
+            """
+            params = list(recipient)
+            if not mark_all:
+                query += f" AND notification_id IN ({', '.join(['%s'] * len(notification_ids))})"
+                params.extend(notification_ids)
+            cursor.execute(query, params)
+            updated = cursor.rowcount
+
+            if updated:
+                cursor.execute("""
+                    UPDATE notification_unread_counts
+                    SET unread_count = GREATEST(unread_count - %s, 0)
+                    WHERE recipient_type = %s AND recipient_id = %s
+                """, (updated, *recipient))
+            marked += updated
+
+        connection.commit()
+        return jsonify({'status': 'success', 'data': {'marked_count': marked}}), 200
+    except Exception as e:
+        connection.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@notify_bp.route('/api/notifications/stream', methods=['GET'])
+@token_in_query
+def stream_notifications():
+    # Server-Sent Events: one long-lived response per client, fed by the
+    # in-process broker. Run gunicorn with threaded or async workers for this
+    # route; each worker only sees notifications sent through itself.
+    recipients = _requested_recipients(request.args)
+    if not recipients:
+        return jsonify({'status': 'error', 'message': 'user_id, student_id or parent_id is required'}), 400
+
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+        recipients = [(recipient_type, int(recipient_id)) for recipient_type, recipient_id in recipients]
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid recipient or Last-Event-ID'}), 400
+
+    connection = get_db()
+    if not connection:
+        return jsonify({'status': 'error', 'message': 'Database connection failed'}), 500
+
+    try:
+        cursor = get_cursor()
+
+        # Tag the subscriber with every audience a bulk send can address it by
+        tags = set(recipients)
+        for recipient_type, recipient_id in recipients:
+            if recipient_type == 'student':
+                cursor.execute("SELECT grade FROM students WHERE student_id = %s", (recipient_id,))
+                tags.update({('students', '*')} | {('students', row[0]) for row in cursor.fetchall()})
+            elif recipient_type == 'parent':
+                cursor.execute("""
+                    SELECT DISTINCT s.grade
+                    FROM student_parent sp
+                    JOIN students s ON s.student_id = sp.student_id
+                    WHERE sp.parent_id = %s
+                """, (recipient_id,))
+                tags.update({('parents', '*')} | {('parents', row[0]) for row in cursor.fetchall()})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
     finally:
-        close_connection(connection)
+        # Don't hold a pooled connection for the lifetime of the stream
+        release_db()
+
+    subscription = notification_broker.subscribe(tags, last_event_id)
+    if subscription is None:
+        return jsonify({'status': 'error', 'message': 'Too many open notification streams'}), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(SSE_HEARTBEAT_INTERVAL)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                elif event is RESET:
+                    yield "event: reset\ndata: {}\n\n"
+                else:
+                    event_id, payload, _ = event
+                    yield f"id: {event_id}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
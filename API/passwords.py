@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Stored hashes made with a different method are upgraded on the next login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+# Hashes a bulk caller keeps queued at once; the rest of the queue stays free
+# for logins, which then wait behind at most this many bulk hashes
+PASSWORD_HASH_BULK_IN_FLIGHT = int(os.getenv('PASSWORD_HASH_BULK_IN_FLIGHT', PASSWORD_HASH_WORKERS))
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+_executor = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+_method_prefix = None
+stats = {'pending': 0, 'completed': 0, 'rejected': 0, 'restarts': 0}
+
+
+def _get_executor():
+    # Created lazily so every gunicorn worker gets its own pool after fork;
+    # spawned children avoid forking a multi-threaded worker
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _replace_executor(broken):
+    # A child killed mid-hash (OOM, segfault) breaks the whole pool for good;
+    # drop it so the next submit starts a fresh one
+    global _executor
+    with _lock:
+        if _executor is not broken:
+            return
+        _executor = None
+        stats['restarts'] += 1
+    print("Password hashing pool broken; starting a new one")
+    broken.shutdown(wait=False)
+
+
+def _done(future):
+    with _lock:
+        stats['pending'] -= 1
+        stats['completed'] += 1
+    _slots.release()
+
+
+def _submit(fn, *args):
+    # At most PASSWORD_HASH_MAX_PENDING hashes queued per worker; beyond that
+    # callers wait up to PASSWORD_HASH_TIMEOUT and then get HashQueueFull
+    if not _slots.acquire(timeout=PASSWORD_HASH_TIMEOUT):
+        with _lock:
+            stats['rejected'] += 1
+        raise HashQueueFull("Password hashing queue is full")
+    with _lock:
+        stats['pending'] += 1
+    try:
+        executor = _get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            _replace_executor(executor)
+            executor = _get_executor()
+            future = executor.submit(fn, *args)
+    except Exception:
+        with _lock:
+            stats['pending'] -= 1
+        _slots.release()
+        raise
+    future.executor = executor
+    future.add_done_callback(_done)
+    return future
+
+
+def _result(future, fn, *args):
+    # Resubmitted once on a fresh pool if the old one broke while it was
+    # queued; a hash that takes too long is reported as overload (503)
+    try:
+        try:
+            return future.result(PASSWORD_HASH_TIMEOUT)
+        except BrokenProcessPool:
+            _replace_executor(future.executor)
+            return _submit(fn, *args).result(PASSWORD_HASH_TIMEOUT)
+    except TimeoutError:
+        raise HashQueueFull("Password hashing timed out")
+
+
+def _call(fn, *args):
+    return _result(_submit(fn, *args), fn, *args)
+
+
+def hash_password(password):
+    return _call(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def hash_passwords(passwords):
+    # Sliding window of PASSWORD_HASH_BULK_IN_FLIGHT hashes: enough to keep
+    # every hashing process busy without filling the shared queue
+    hashes = [None] * len(passwords)
+    in_flight = deque()
+    for index, password in enumerate(passwords):
+        if len(in_flight) >= max(PASSWORD_HASH_BULK_IN_FLIGHT, 1):
+            done, done_password, future = in_flight.popleft()
+            hashes[done] = _result(future, generate_password_hash, done_password, PASSWORD_HASH_METHOD)
+        in_flight.append((index, password, _submit(generate_password_hash, password, PASSWORD_HASH_METHOD)))
+    for done, done_password, future in in_flight:
+        hashes[done] = _result(future, generate_password_hash, done_password, PASSWORD_HASH_METHOD)
+    return hashes
+
+
+def verify_password(pwhash, password):
+    return _call(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    # Compare the stored hash's method prefix with the configured one, with
+    # werkzeug's defaults filled in (e.g. "scrypt" -> "scrypt:32768:8:1")
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = hash_password('').split('$', 1)[0]
+    return pwhash.split('$', 1)[0] != _method_prefix
+
+
+def queue_depth():
+    return stats['pending']
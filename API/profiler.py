@@ -0,0 +1,283 @@
+import json
+import os
+import sys
+import threading
+import time
+from flask import Blueprint, request, jsonify, Response, g, current_app
+from jwt_auth import roles_required, JWT_AUTH_ENABLED
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL_MS', 10)) / 1000
+PROFILER_MAX_DEPTH = int(os.getenv('PROFILER_MAX_DEPTH', 64))
+# Distinct stacks kept per route; further new stacks are counted as [truncated]
+PROFILER_MAX_STACKS = int(os.getenv('PROFILER_MAX_STACKS', 5000))
+# Shared directory through which route toggles and samples reach every
+# gunicorn worker; unset = this process only
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.getenv('METRICS_MULTIPROC_DIR'))
+PROFILER_SYNC_INTERVAL = 1.0
+
+
+profiler_bp = Blueprint("profiler", __name__)
+
+
+class SamplingProfiler:
+    # Samples the Python stacks of threads currently serving profiled
+    # requests via sys._current_frames() and aggregates them per route as
+    # collapsed stacks ("frame;frame;frame count"). The sampler thread only
+    # wakes while at least one profiled request is running.
+
+    def __init__(self, interval=PROFILER_INTERVAL, directory=PROFILER_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.routes = set()
+        self.stacks = {}  # route -> {collapsed stack: samples}
+        self.samples = 0
+        self._targets = {}  # thread ident -> route
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._dirty = False
+        self._written_at = 0.0
+        self._synced_at = 0.0
+        self._state_mtime = None
+        self._cleared_at = None
+
+    # Shared state: {"routes": [...], "cleared_at": ts} in profiler.json and
+    # one profile-<pid>.json of samples per worker
+    def _state_path(self):
+        return os.path.join(self.directory, 'profiler.json')
+
+    def _write_json(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def _sync_state(self):
+        # Pick up toggles and clears made through another worker
+        if not self.directory or time.monotonic() - self._synced_at < PROFILER_SYNC_INTERVAL:
+            return
+        self._synced_at = time.monotonic()
+        try:
+            mtime = os.stat(self._state_path()).st_mtime
+            if mtime == self._state_mtime:
+                return
+            with open(self._state_path()) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._state_mtime = mtime
+        self.routes = set(state.get('routes', []))
+        if state.get('cleared_at') != self._cleared_at:
+            if self._cleared_at is not None:
+                self._clear_local()
+            self._cleared_at = state.get('cleared_at')
+
+    def _save_state(self):
+        if self.directory:
+            self._cleared_at = self._cleared_at or time.time()
+            self._write_json(self._state_path(), {'routes': sorted(self.routes), 'cleared_at': self._cleared_at})
+
+    def route_enabled(self, route):
+        self._sync_state()
+        return route in self.routes
+
+    def enabled_routes(self):
+        self._sync_state()
+        return sorted(self.routes)
+
+    def set_route(self, route, enabled):
+        self._sync_state()
+        if enabled:
+            self.routes.add(route)
+        else:
+            self.routes.discard(route)
+        self._save_state()
+
+    def _clear_local(self):
+        with self._lock:
+            self.stacks = {}
+            self.samples = 0
+            self._dirty = True
+
+    def clear(self):
+        self._clear_local()
+        if self.directory:
+            # Other workers drop their samples when they next see cleared_at
+            self._cleared_at = time.time()
+            self._save_state()
+            for name in os.listdir(self.directory):
+                if name.startswith('profile-') and name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def start_profiling(self, ident, route):
+        self._ensure_thread()
+        with self._lock:
+            self._targets[ident] = route
+        self._wake.set()
+
+    def stop_profiling(self, ident):
+        with self._lock:
+            self._targets.pop(ident, None)
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="sampling-profiler", daemon=True).start()
+
+    def _collapse(self, frame):
+        frames = []
+        while frame is not None and len(frames) < PROFILER_MAX_DEPTH:
+            code = frame.f_code
+            frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
+
+    def _sample(self):
+        with self._lock:
+            targets = list(self._targets.items())
+        if not targets:
+            return
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, route in targets:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._collapse(frame)
+                route_stacks = self.stacks.setdefault(route, {})
+                if stack not in route_stacks and len(route_stacks) >= PROFILER_MAX_STACKS:
+                    stack = '[truncated]'
+                route_stacks[stack] = route_stacks.get(stack, 0) + 1
+                self.samples += 1
+            self._dirty = True
+
+    def _flush(self):
+        if not self.directory or not self._dirty or time.monotonic() - self._written_at < PROFILER_SYNC_INTERVAL:
+            return
+        with self._lock:
+            stacks = {route: dict(route_stacks) for route, route_stacks in self.stacks.items()}
+            self._dirty = False
+        self._written_at = time.monotonic()
+        try:
+            self._write_json(os.path.join(self.directory, f'profile-{os.getpid()}.json'), stacks)
+        except OSError as e:
+            print(f"Profiler flush failed: {e}")
+
+    def _run(self):
+        while True:
+            if not self._targets:
+                self._flush()
+                self._wake.wait(PROFILER_SYNC_INTERVAL)
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            self._sample()
+            self._flush()
+
+    def collapsed(self, route=None):
+        # Samples from every worker merged, one "stack count" line each
+        with self._lock:
+            merged = {name: dict(route_stacks) for name, route_stacks in self.stacks.items()}
+        if self.directory and os.path.isdir(self.directory):
+            own = f'profile-{os.getpid()}.json'
+            for name in os.listdir(self.directory):
+                if not name.startswith('profile-') or not name.endswith('.json') or name == own:
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        stacks = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for stack_route, route_stacks in stacks.items():
+                    target = merged.setdefault(stack_route, {})
+                    for stack, count in route_stacks.items():
+                        target[stack] = target.get(stack, 0) + count
+
+        lines = []
+        for stack_route in sorted(merged):
+            if route and stack_route != route:
+                continue
+            for stack, count in sorted(merged[stack_route].items()):
+                lines.append(f'{stack_route};{stack} {count}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+profiler = SamplingProfiler()
+
+
+def _profile_requested():
+    # ?profile=1 or "X-Profile: 1" profiles a single request, admins only
+    if request.headers.get('X-Profile') != '1' and request.args.get('profile') != '1':
+        return False
+    return not JWT_AUTH_ENABLED or (g.get('current_user') or {}).get('role') == 'admin'
+
+
+def start_request():
+    if request.endpoint is None or request.blueprint == 'profiler':
+        return None
+    if profiler.route_enabled(request.endpoint) or _profile_requested():
+        g.profiled = True
+        profiler.start_profiling(threading.get_ident(), request.endpoint)
+    return None
+
+
+def stop_request(exception=None):
+    if g.pop('profiled', False):
+        profiler.stop_profiling(threading.get_ident())
+
+
+def init_app(app):
+    # Registered after auth so g.current_user is known
+    app.before_request(start_request)
+    app.teardown_request(stop_request)
+
+
+@profiler_bp.route('/api/profiler', methods=['GET'])
+@roles_required('admin')
+def profiler_status():
+    return jsonify({
+        "status": "success",
+        "data": {
+            "routes": profiler.enabled_routes(),
+            "interval_ms": profiler.interval * 1000,
+            "samples": profiler.samples,
+            "shared": bool(profiler.directory)
+        }
+    }), 200
+
+
+# Turn continuous profiling of an endpoint (e.g. dashboard.get_class_performance_report) on or off
+@profiler_bp.route('/api/profiler/routes', methods=['POST'])
+@roles_required('admin')
+def toggle_profiled_route():
+    payload = request.get_json(silent=True) or request.form
+    endpoint = payload.get('endpoint')
+    if endpoint not in current_app.view_functions:
+        return jsonify({"status": "error", "message": f"Unknown endpoint '{endpoint}'"}), 400
+    enabled = str(payload.get('enabled', '1')).lower() in ('1', 'true', 'yes')
+    try:
+        profiler.set_route(endpoint, enabled)
+    except OSError as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success", "data": {"routes": profiler.enabled_routes()}}), 200
+
+
+# Collapsed stacks for flamegraph.pl / speedscope; ?route= filters, ?clear=1 resets
+@profiler_bp.route('/api/profiler/stacks', methods=['GET'])
+@roles_required('admin')
+def profiler_stacks():
+    body = profiler.collapsed(request.args.get('route'))
+    if request.args.get('clear') in ('1', 'true'):
+        profiler.clear()
+    return Response(body, mimetype='text/plain')
@@ -0,0 +1,285 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from flask import Blueprint, request, jsonify, Response
+from dbconn import pool_stats
+from instrumentation import registry, Histogram, LATENCY_BUCKETS_MS
+from jwt_auth import public, token_cache
+from dashboard import statistics_snapshot
+from events import notification_broker
+from slow_queries import slow_query_log
+import passwords
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared directory for per-worker snapshots (e.g. one tmpfs path for all
+# gunicorn workers; clear it when the server starts). Unset = this process only.
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+# Gauges from snapshots older than this belong to dead workers and are skipped;
+# their counters are kept so totals never go backwards
+METRICS_STALE_AFTER = float(os.getenv('METRICS_STALE_AFTER', 3 * METRICS_WRITE_INTERVAL))
+# Optional bearer token for scrapers (/metrics bypasses JWT auth)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRIC_HELP = {
+    'sms_db_pool_checkouts_total': 'Connections handed out by the pool.',
+    'sms_db_pool_connects_total': 'New MySQL connections opened.',
+    'sms_db_pool_discarded_total': 'Connections closed instead of returned to the pool.',
+    'sms_db_pool_ping_failures_total': 'Idle connections that failed the pre-ping.',
+    'sms_db_pool_timeouts_total': 'Checkouts that timed out waiting for a connection.',
+    'sms_db_pool_wait_seconds_total': 'Time spent waiting for a pooled connection.',
+    'sms_cache_hits_total': 'Cache hits.',
+    'sms_cache_misses_total': 'Cache misses.',
+    'sms_dashboard_refreshes_total': 'Dashboard statistics snapshot refreshes.',
+    'sms_dashboard_refresh_errors_total': 'Failed dashboard statistics refreshes.',
+    'sms_password_hashes_total': 'Password hash and verify jobs completed.',
+    'sms_password_hashes_rejected_total': 'Password jobs rejected because the queue was full.',
+    'sms_password_hash_pool_restarts_total': 'Password hashing pools replaced after a child process died.',
+    'sms_sse_events_published_total': 'Notification events published to the SSE broker.',
+    'sms_sse_events_delivered_total': 'Notification events queued to SSE subscribers.',
+    'sms_db_slow_queries_total': 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS.',
+    'sms_db_pool_size': 'Configured pool size.',
+    'sms_db_pool_max_overflow': 'Configured pool overflow.',
+    'sms_db_pool_connections': 'Open pooled connections by state.',
+    'sms_password_hash_queue_depth': 'Password jobs queued or running.',
+    'sms_sse_subscribers': 'Open notification streams.',
+    'sms_token_cache_entries': 'Verified tokens cached.',
+}
+
+
+prometheus_bp = Blueprint("prometheus", __name__)
+
+
+def collect_local():
+    # This worker's counters and gauges as (name, labels, value) triples
+    pool = pool_stats()
+    counters = [
+        ('sms_db_pool_checkouts_total', {}, pool['checkouts']),
+        ('sms_db_pool_connects_total', {}, pool['connects']),
+        ('sms_db_pool_discarded_total', {}, pool['discarded']),
+        ('sms_db_pool_ping_failures_total', {}, pool['ping_failures']),
+        ('sms_db_pool_timeouts_total', {}, pool['timeouts']),
+        ('sms_db_pool_wait_seconds_total', {}, pool['wait_time_total']),
+        ('sms_cache_hits_total', {'cache': 'dashboard'}, statistics_snapshot.stats['hits']),
+        ('sms_cache_misses_total', {'cache': 'dashboard'}, statistics_snapshot.stats['misses']),
+        ('sms_cache_hits_total', {'cache': 'token'}, token_cache.stats['hits']),
+        ('sms_cache_misses_total', {'cache': 'token'}, token_cache.stats['misses']),
+        ('sms_dashboard_refreshes_total', {}, statistics_snapshot.stats['refreshes']),
+        ('sms_dashboard_refresh_errors_total', {}, statistics_snapshot.stats['refresh_errors']),
+        ('sms_password_hashes_total', {}, passwords.stats['completed']),
+        ('sms_password_hashes_rejected_total', {}, passwords.stats['rejected']),
+        ('sms_password_hash_pool_restarts_total', {}, passwords.stats['restarts']),
+        ('sms_sse_events_published_total', {}, notification_broker.stats['published']),
+        ('sms_sse_events_delivered_total', {}, notification_broker.stats['delivered']),
+        ('sms_db_slow_queries_total', {}, slow_query_log.stats['recorded']),
+    ]
+    gauges = [
+        ('sms_db_pool_size', {}, pool['size']),
+        ('sms_db_pool_max_overflow', {}, pool['max_overflow']),
+        ('sms_db_pool_connections', {'state': 'idle'}, pool['idle']),
+        ('sms_db_pool_connections', {'state': 'checked_out'}, pool['checked_out']),
+        ('sms_password_hash_queue_depth', {}, passwords.queue_depth()),
+        ('sms_sse_subscribers', {}, notification_broker.subscriber_count()),
+        ('sms_token_cache_entries', {}, len(token_cache)),
+    ]
+    return {
+        'pid': os.getpid(),
+        'written_at': time.time(),
+        'registry': registry.state(),
+        'counters': counters,
+        'gauges': gauges
+    }
+
+
+class SnapshotWriter:
+    # Writes this worker's snapshot to METRICS_MULTIPROC_DIR every interval.
+    # Started lazily from the first request so each forked worker runs its own.
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'worker-{os.getpid()}.json')
+
+    def write(self):
+        snapshot = collect_local()
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f)
+        # Atomic swap so a scrape never reads a half-written file
+        os.replace(temp_path, self.path)
+        return snapshot
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(target=self._run, name="metrics-writer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.write()
+            except Exception as e:
+                print(f"Metrics snapshot write failed: {e}")
+            time.sleep(self.interval)
+
+
+snapshot_writer = SnapshotWriter(METRICS_MULTIPROC_DIR, METRICS_WRITE_INTERVAL) if METRICS_MULTIPROC_DIR else None
+
+
+def read_snapshots():
+    if snapshot_writer is None:
+        return [collect_local()]
+    snapshots = [snapshot_writer.write()]
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'worker-*.json')):
+        if path == snapshot_writer.path:
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _sum_series(snapshots, kind, now):
+    # {name: {label items: value}} summed across snapshots
+    series = {}
+    for snapshot in snapshots:
+        if kind == 'gauges' and now - snapshot['written_at'] > METRICS_STALE_AFTER:
+            continue
+        for name, labels, value in snapshot[kind]:
+            by_labels = series.setdefault(name, {})
+            key = tuple(sorted(labels.items()))
+            by_labels[key] = by_labels.get(key, 0) + value
+    return series
+
+
+def _histogram_lines(name, labels, histogram):
+    # Stored in milliseconds, exported in seconds with cumulative buckets
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels({**labels, "le": f"{bound / 1000:g}"})} {cumulative}')
+    lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(labels)} {histogram.sum / 1000}')
+    lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+    return lines
+
+
+def render(snapshots):
+    now = time.time()
+
+    # Merge per-route metrics and the query histogram across workers
+    routes = {}
+    query_latency = Histogram()
+    for snapshot in snapshots:
+        query_latency.merge(Histogram.from_state(snapshot['registry']['query_latency']))
+        for route, state in snapshot['registry']['routes'].items():
+            merged = routes.setdefault(route, {
+                'blueprint': state['blueprint'], 'requests': 0, 'errors': 0, 'queries': 0, 'rows': 0,
+                'response_bytes': 0, 'latency': Histogram(), 'db_latency': Histogram()
+            })
+            for field in ('requests', 'errors', 'queries', 'rows', 'response_bytes'):
+                merged[field] += state[field]
+            merged['latency'].merge(Histogram.from_state(state['latency']))
+            merged['db_latency'].merge(Histogram.from_state(state['db_latency']))
+
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    route_labels = {}
+    for route, merged in routes.items():
+        method, _, rule = route.partition(' ')
+        route_labels[route] = {'blueprint': merged['blueprint'], 'method': method, 'route': rule}
+
+    for name, field, help_text in (
+        ('sms_http_requests_total', 'requests', 'HTTP requests handled.'),
+        ('sms_http_request_errors_total', 'errors', 'HTTP requests answered with a 5xx status.'),
+        ('sms_http_db_queries_total', 'queries', 'SQL statements issued while handling requests.'),
+        ('sms_http_db_rows_total', 'rows', 'Rows fetched while handling requests.'),
+        ('sms_http_response_bytes_total', 'response_bytes', 'Response body bytes (streamed bodies not counted).'),
+    ):
+        family(name, 'counter', help_text)
+        for route in sorted(routes):
+            lines.append(f'{name}{_labels(route_labels[route])} {routes[route][field]}')
+
+    for name, field, help_text in (
+        ('sms_http_request_duration_seconds', 'latency', 'Request wall time.'),
+        ('sms_http_request_db_seconds', 'db_latency', 'Time spent in SQL per request.'),
+    ):
+        family(name, 'histogram', help_text)
+        for route in sorted(routes):
+            lines.extend(_histogram_lines(name, route_labels[route], routes[route][field]))
+
+    family('sms_db_query_duration_seconds', 'histogram', 'Duration of individual SQL statements.')
+    lines.extend(_histogram_lines('sms_db_query_duration_seconds', {}, query_latency))
+
+    counters = _sum_series(snapshots, 'counters', now)
+    for name in sorted(counters):
+        family(name, 'counter', METRIC_HELP.get(name, name))
+        for key, value in sorted(counters[name].items()):
+            lines.append(f'{name}{_labels(dict(key))} {value}')
+
+    gauges = _sum_series(snapshots, 'gauges', now)
+    for name in sorted(gauges):
+        family(name, 'gauge', METRIC_HELP.get(name, name) + ' Summed over live workers.')
+        for key, value in sorted(gauges[name].items()):
+            lines.append(f'{name}{_labels(dict(key))} {value}')
+
+    family('sms_cache_hit_ratio', 'gauge', 'Cache hits / (hits + misses) since start.')
+    hits = counters.get('sms_cache_hits_total', {})
+    misses = counters.get('sms_cache_misses_total', {})
+    for key in sorted(hits):
+        total = hits[key] + misses.get(key, 0)
+        lines.append(f'sms_cache_hit_ratio{_labels(dict(key))} {hits[key] / total if total else 0}')
+
+    family('sms_workers', 'gauge', 'Workers that reported a snapshot recently.')
+    lines.append(f'sms_workers {sum(1 for s in snapshots if now - s["written_at"] <= METRICS_STALE_AFTER)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+@prometheus_bp.route('/metrics', methods=['GET'])
+@public
+def metrics():
+    if METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header, f'Bearer {METRICS_TOKEN}'):
+            return jsonify({"status": "error", "message": "Invalid metrics token"}), 401
+    return Response(render(read_snapshots()), content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    if snapshot_writer is not None:
+        app.before_request(snapshot_writer.ensure_started)
@@ -0,0 +1,187 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import Blueprint, request, jsonify, has_request_context
+from dbconn import create_unpooled_connection
+import instrumentation
+from instrumentation import route_name
+from jwt_auth import roles_required
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+# A statement's plan is reused for this long instead of running EXPLAIN again
+SLOW_QUERY_EXPLAIN_TTL = float(os.getenv('SLOW_QUERY_EXPLAIN_TTL', 300))
+SLOW_QUERY_STATEMENT_LENGTH = 2000
+
+# Statements worth a plan (EXPLAIN only plans them, it never executes them)
+EXPLAINABLE = re.compile(r'^\s*(select|with|update|delete)\b', re.IGNORECASE)
+
+
+slow_queries_bp = Blueprint("slow_queries", __name__)
+
+
+def _normalise(statement):
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    return ' '.join(statement.split())
+
+
+def _params_shape(params):
+    # Types of the bound values, never the values themselves; runs of the
+    # same type (e.g. IN lists, multi-row VALUES) are collapsed to "type x N"
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    shape = []
+    for value in params:
+        name = type(value).__name__
+        if shape and shape[-1][0] == name:
+            shape[-1][1] += 1
+        else:
+            shape.append([name, 1])
+    return [name if count == 1 else f'{name} x {count}' for name, count in shape]
+
+
+class SlowQueryLog:
+    # Ring buffer of the last `size` statements slower than threshold_ms.
+    # Plans are collected by a background thread on its own connection that
+    # bypasses the pool and instrumentation, so EXPLAIN never adds to request
+    # latency or records itself.
+
+    def __init__(self, threshold_ms=SLOW_QUERY_THRESHOLD_MS, size=SLOW_QUERY_LOG_SIZE, explain=SLOW_QUERY_EXPLAIN):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._pending = queue.Queue(maxsize=size)
+        self._plans = {}  # statement -> (explained_at, plan)
+        self._pid = None
+        self._connection = None
+        self.stats = {'recorded': 0, 'explained': 0, 'explain_errors': 0, 'explain_skipped': 0}
+
+    def record(self, operation, params, duration_ms):
+        statement = _normalise(operation)
+        entry = {
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'route': route_name() if has_request_context() else 'background',
+            'duration_ms': round(duration_ms, 3),
+            'statement': statement[:SLOW_QUERY_STATEMENT_LENGTH],
+            'params_shape': _params_shape(params),
+            'rows': 0,
+            'plan': None
+        }
+        with self._lock:
+            entry['id'] = self._next_id
+            self._next_id += 1
+            self._entries.append(entry)
+            self.stats['recorded'] += 1
+
+        if self.explain and EXPLAINABLE.match(statement):
+            cached = self._plans.get(statement)
+            if cached and time.monotonic() - cached[0] < SLOW_QUERY_EXPLAIN_TTL:
+                entry['plan'] = cached[1]
+            else:
+                self._start()
+                try:
+                    # The real parameters are only kept until EXPLAIN has run
+                    self._pending.put_nowait((entry, operation, params))
+                except queue.Full:
+                    self.stats['explain_skipped'] += 1
+        return entry
+
+    def entries(self):
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+    def _start(self):
+        # Checked per pid: a worker forked after the thread started inherits
+        # the object but not the thread, so it gets its own thread, queue
+        # (the old one still lists the parent thread as a waiter) and connection
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._pending = queue.Queue(maxsize=self._pending.maxsize)
+                self._connection = None
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="slow-query-explainer", daemon=True).start()
+
+    def _explain(self, operation, params):
+        if self._connection is None or not self._connection.is_connected():
+            self._connection = create_unpooled_connection()
+        cursor = self._connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {operation}", params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _run(self):
+        while True:
+            entry, operation, params = self._pending.get()
+            try:
+                plan = self._explain(operation, params)
+                entry['plan'] = plan
+                with self._lock:
+                    self._plans[entry['statement']] = (time.monotonic(), plan)
+                    if len(self._plans) > self._entries.maxlen:
+                        self._plans.pop(next(iter(self._plans)))
+                self.stats['explained'] += 1
+            except Exception as e:
+                entry['explain_error'] = str(e)
+                self.stats['explain_errors'] += 1
+                if self._connection is not None:
+                    try:
+                        self._connection.close()
+                    except Exception:
+                        pass
+                    self._connection = None
+
+
+slow_query_log = SlowQueryLog()
+
+
+def init_app(app):
+    if instrumentation.INSTRUMENTATION_ENABLED and SLOW_QUERY_THRESHOLD_MS > 0:
+        instrumentation.set_slow_query_recorder(slow_query_log)
+
+
+# Slow statements seen by this worker, newest first; ?clear=1 empties the log
+@slow_queries_bp.route('/api/metrics/slow_queries', methods=['GET'])
+@roles_required('admin')
+def slow_queries():
+    entries = slow_query_log.entries()
+    if request.args.get('clear') in ('1', 'true'):
+        slow_query_log.clear()
+    return jsonify({
+        "status": "success",
+        "data": {
+            "threshold_ms": slow_query_log.threshold_ms,
+            "stats": slow_query_log.stats,
+            "queries": entries
+        }
+    }), 200
+
+
+@slow_queries_bp.route('/api/metrics/slow_queries', methods=['DELETE'])
+@roles_required('admin')
+def clear_slow_queries():
+    slow_query_log.clear()
+    return jsonify({"status": "success", "message": "Slow query log cleared"}), 200
@@ -0,0 +1,60 @@
+# Compare Flask's default JSON provider with FastJSONProvider on a large
+# response shaped like cursor(dictionary=True) rows.
+#
+#   python benchmarks/bench_json_provider.py [rows] [repeat]
+
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import json_provider
+from json_provider import FastJSONProvider
+
+
+def make_rows(count):
+    start = datetime(2024, 4, 1, 8, 30)
+    return [
+        {
+            "fee_id": i,
+            "student_id": 1000 + i % 5000,
+            "full_name": f"Student {i}",
+            "grade": str(1 + i % 12),
+            "amount_paid": Decimal(f"{500 + i % 2500}.50"),
+            "total_fee": Decimal("25000.00"),
+            "payment_method": "cash" if i % 3 else "online",
+            "payment_date": start + timedelta(minutes=i),
+            "date_of_birth": date(2010, 1, 1) + timedelta(days=i % 3000),
+            "is_read": bool(i % 2)
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    payload = {"status": "success", "data": make_rows(count)}
+
+    default_app = Flask("default")
+    fast_app = Flask("fast")
+    fast_app.json = FastJSONProvider(fast_app)
+    candidates = [("flask default", default_app)]
+    candidates.append((f"FastJSONProvider ({'orjson' if json_provider.orjson else 'stdlib'})", fast_app))
+
+    print(f"{count} rows, best of {repeat}")
+    for name, app in candidates:
+        with app.app_context():
+            assert isinstance(app.json, (DefaultJSONProvider, FastJSONProvider))
+            body = app.json.response(payload).get_data()
+            best = min(timeit.repeat(lambda: app.json.response(payload).get_data(), number=1, repeat=repeat))
+        print(f"  {name:<32} {best * 1000:8.1f} ms  {len(body) / 1e6:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,572 @@
+# Populate the database with a large, realistic data set so performance work
+# has a reproducible baseline.
+#
+#   python benchmarks/generate_data.py --students 10000 --school-days 180
+#   python benchmarks/generate_data.py --students 1000000 --school-days 200 --method load-data --reset
+#
+# Apply db_script.sql and migrations/ first. Output depends only on the
+# arguments (password salts aside): --start-date defaults to the school day `--school-days` weekdays
+# before today, so pass it explicitly to reproduce a data set exactly.
+# --method load-data (LOAD DATA LOCAL INFILE) is several times faster than
+# multi-row INSERTs but needs local_infile=ON on the server.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'API'))
+
+from dbconn import create_unpooled_connection
+from passwords import PASSWORD_HASH_METHOD
+from werkzeug.security import generate_password_hash
+
+
+# Rows per LOAD DATA file
+LOAD_DATA_FILE_ROWS = 1_000_000
+SIBLING_WINDOW = 25
+
+GRADES = tuple(range(1, 13))
+# Relative class sizes: enrolment tapers off in the senior grades
+GRADE_CUM_WEIGHTS = list(accumulate(1.0 - 0.035 * (grade - 1) for grade in GRADES))
+
+FIRST_NAMES = {
+    'Male': ('Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan', 'Kabir',
+             'Rahul', 'Karthik', 'Nikhil', 'Pranav', 'Rajesh', 'Suresh', 'Vikram', 'Manoj', 'Anil', 'Ravi'),
+    'Female': ('Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Anika', 'Navya', 'Myra', 'Kavya', 'Ira',
+               'Priya', 'Sneha', 'Lakshmi', 'Divya', 'Pooja', 'Meera', 'Neha', 'Swathi', 'Deepa', 'Radha'),
+}
+LAST_NAMES = ('Sharma', 'Reddy', 'Patel', 'Kumar', 'Singh', 'Rao', 'Naidu', 'Iyer', 'Nair', 'Gupta',
+              'Verma', 'Joshi', 'Mehta', 'Das', 'Chowdary', 'Pillai', 'Menon', 'Bose', 'Mishra', 'Yadav')
+STREETS = ('MG Road', 'Station Road', 'Gandhi Nagar', 'Temple Street', 'Lake View Colony', 'Park Avenue',
+           'Nehru Street', 'Market Road', 'Hill Colony', 'Church Street')
+CITIES = ('Hyderabad', 'Vijayawada', 'Guntur', 'Visakhapatnam', 'Chennai', 'Bengaluru', 'Pune', 'Warangal')
+OCCUPATIONS = ('Engineer', 'Teacher', 'Farmer', 'Doctor', 'Business', 'Accountant', 'Driver', 'Nurse',
+               'Government Employee', 'Homemaker', None)
+
+# (name, code, first grade, last grade, difficulty in marks)
+SUBJECTS = (
+    ('English', 'ENG', 1, 12, 0),
+    ('Mathematics', 'MAT', 1, 12, 6),
+    ('Hindi', 'HIN', 1, 10, 2),
+    ('Environmental Studies', 'EVS', 1, 5, -2),
+    ('Science', 'SCI', 6, 10, 4),
+    ('Social Studies', 'SST', 6, 10, 2),
+    ('Computer Science', 'CSC', 6, 12, 0),
+    ('Physics', 'PHY', 11, 12, 8),
+    ('Chemistry', 'CHE', 11, 12, 7),
+    ('Biology', 'BIO', 11, 12, 5),
+)
+EXAM_NAMES = ('Unit Test 1', 'Quarterly Examination', 'Unit Test 2', 'Half Yearly Examination',
+              'Unit Test 3', 'Pre-Final Examination', 'Annual Examination')
+# (minimum percentage, letter) as stored in exam_results.grade
+RESULT_GRADES = ((90, 'A+'), (80, 'A'), (65, 'B'), (50, 'C'), (40, 'D'), (0, 'F'))
+
+NOTIFICATION_TEMPLATES = (
+    ('Fee Reminder', 'The next fee installment for grade {grade} is due at the end of the month.', 'warning'),
+    ('Parent-Teacher Meeting', 'A parent-teacher meeting for grade {grade} is scheduled this Saturday.', 'info'),
+    ('Exam Schedule', 'The examination timetable for grade {grade} has been published.', 'info'),
+    ('Holiday Notice', 'The school will remain closed tomorrow.', 'info'),
+    ('Sports Day', 'Annual sports day practice starts next week for grade {grade}.', 'info'),
+    ('Attendance Alert', 'Attendance has fallen below the required 75%.', 'alert'),
+    ('Results Published', 'Results for grade {grade} are now available.', 'info'),
+    ('Transport Update', 'Bus routes change from Monday.', 'warning'),
+)
+
+GENERATED_TABLES = ('exam_results', 'attendance', 'student_fee_balances', 'student_fees', 'student_parent',
+                    'notification_recipients', 'notification_unread_counts', 'notification_messages',
+                    'parents', 'students', 'exams')
+
+
+def _tsv(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return str(value)
+
+
+class TableLoader:
+    # Writes rows for one table with multi-row INSERTs of `batch_size` rows,
+    # or with --method load-data streams them to a temporary TSV file that is
+    # loaded with LOAD DATA LOCAL INFILE every LOAD_DATA_FILE_ROWS rows.
+    # Each batch is committed on its own.
+
+    def __init__(self, connection, table, columns, method, batch_size):
+        self.connection = connection
+        self.table = table
+        self.columns = columns
+        self.method = method
+        self.batch_size = batch_size if method == 'insert' else LOAD_DATA_FILE_ROWS
+        self.count = 0
+        self._rows = []
+        self._file = None
+        self._pending = 0
+        self._started = time.perf_counter()
+
+    def add(self, row):
+        if self.method == 'insert':
+            self._rows.append(row)
+        else:
+            if self._file is None:
+                self._file = tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8',
+                                                         newline='\n', delete=False)
+            self._file.write('\t'.join(map(_tsv, row)) + '\n')
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        cursor = self.connection.cursor()
+        try:
+            if self.method == 'insert':
+                placeholders = '(' + ', '.join(['%s'] * len(self.columns)) + ')'
+                cursor.execute(f"""
+                    INSERT INTO {self.table} ({', '.join(self.columns)})
+                    VALUES {', '.join([placeholders] * len(self._rows))}
+                """, [value for row in self._rows for value in row])
+                self._rows = []
+            else:
+                self._file.close()
+                try:
+                    cursor.execute(f"""
+                        LOAD DATA LOCAL INFILE %s INTO TABLE {self.table}
+                        CHARACTER SET utf8mb4 ({', '.join(self.columns)})
+                    """, (self._file.name,))
+                finally:
+                    os.remove(self._file.name)
+                    self._file = None
+            self.connection.commit()
+        finally:
+            cursor.close()
+        self.count += self._pending
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        elapsed = time.perf_counter() - self._started
+        print(f"  {self.table:<26} {self.count:>12,} rows  {elapsed:8.1f}s  {self.count / elapsed if elapsed else 0:>10,.0f} rows/s")
+        return self.count
+
+
+def school_days(start, count):
+    # Weekdays from start
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def default_start_date(count):
+    # The first of `count` weekdays ending today
+    day = date.today()
+    remaining = count
+    while True:
+        if day.weekday() < 5:
+            remaining -= 1
+            if remaining == 0:
+                return day
+        day -= timedelta(days=1)
+
+
+def next_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def at_time(day, rng, first_hour=8, last_hour=16):
+    return datetime(day.year, day.month, day.day, rng.randint(first_hour, last_hour), rng.randrange(60), rng.randrange(60))
+
+
+def result_grade(percentage):
+    for minimum, letter in RESULT_GRADES:
+        if percentage >= minimum:
+            return letter
+
+
+def generate_users(args, cursor, connection, rng):
+    # One teacher per grade at least; each grade's attendance is marked by its teachers
+    first_user_id = next_id(cursor, 'users', 'user_id')
+    password = generate_password_hash('password', PASSWORD_HASH_METHOD)
+    loader = TableLoader(connection, 'users', ('user_id', 'username', 'password', 'email', 'role', 'full_name'),
+                         args.method, args.batch_size)
+    teachers = max(args.teachers, len(GRADES))
+    for offset in range(teachers):
+        user_id = first_user_id + offset
+        gender = rng.choice(('Male', 'Female'))
+        full_name = f"{rng.choice(FIRST_NAMES[gender])} {rng.choice(LAST_NAMES)}"
+        loader.add((user_id, f"teacher{user_id}", password, f"teacher{user_id}@school.example", 'teacher', full_name))
+    loader.close()
+    teacher_ids = list(range(first_user_id, first_user_id + teachers))
+    return {grade: teacher_ids[grade - 1::len(GRADES)] for grade in GRADES}, teacher_ids
+
+
+def generate_subjects(cursor, connection):
+    cursor.execute(f"""
+        INSERT IGNORE INTO subjects (subject_name, subject_code, description)
+        VALUES {', '.join(['(%s, %s, %s)'] * len(SUBJECTS))}
+    """, [value for name, code, first, last, _ in SUBJECTS
+          for value in (name, code, f"Grades {first}-{last}")])
+    connection.commit()
+    cursor.execute(f"SELECT subject_code, subject_id FROM subjects WHERE subject_code IN ({', '.join(['%s'] * len(SUBJECTS))})",
+                   [subject[1] for subject in SUBJECTS])
+    subject_ids = dict(cursor.fetchall())
+    # Subjects taken in each grade: (subject_id, difficulty)
+    return {grade: [(subject_ids[code], difficulty) for _, code, first, last, difficulty in SUBJECTS
+                    if first <= grade <= last]
+            for grade in GRADES}
+
+
+def generate_exams(args, cursor, connection, days):
+    # Exams spread evenly over the period, each lasting a school week
+    first_exam_id = next_id(cursor, 'exams', 'exam_id')
+    loader = TableLoader(connection, 'exams', ('exam_id', 'exam_name', 'start_date', 'end_date', 'description'),
+                         args.method, args.batch_size)
+    exams = []
+    for index in range(args.exams):
+        start_index = (index + 1) * len(days) // (args.exams + 1)
+        end_index = min(start_index + 4, len(days) - 1)
+        name = EXAM_NAMES[index % len(EXAM_NAMES)]
+        if index >= len(EXAM_NAMES):
+            name = f"{name} ({index // len(EXAM_NAMES) + 1})"
+        loader.add((first_exam_id + index, name, days[start_index], days[end_index], f"{name} for all grades"))
+        exams.append((first_exam_id + index, end_index))
+    loader.close()
+    return exams
+
+
+def generate_students(args, cursor, connection, days, seed):
+    # Students together with their parents, parent links and fee payments.
+    # Per-student traits later passes need are kept in compact arrays.
+    rng = random.Random(f"{seed}:students")
+    fee_rng = random.Random(f"{seed}:fees")
+    first_student_id = next_id(cursor, 'students', 'student_id')
+    next_parent_id = next_id(cursor, 'parents', 'parent_id')
+    first_day = days[0]
+
+    students = TableLoader(connection, 'students', ('student_id', 'full_name', 'date_of_birth', 'gender', 'email',
+                                                    'phone', 'address', 'fee_status', 'total_fee', 'grade',
+                                                    'status', 'enrollment_date'), args.method, args.batch_size)
+    parents = TableLoader(connection, 'parents', ('parent_id', 'full_name', 'relationship', 'phone', 'email',
+                                                  'address', 'occupation'), args.method, args.batch_size)
+    links = TableLoader(connection, 'student_parent', ('student_id', 'parent_id'), args.method, args.batch_size)
+    fees = TableLoader(connection, 'student_fees', ('student_id', 'payment_date', 'fee_status', 'amount_paid',
+                                                    'total_fee', 'remarks', 'payment_method'),
+                       args.method, args.batch_size)
+
+    traits = {
+        'grade': bytearray(args.students),
+        'ability': array('f', bytes(4 * args.students)),
+        'absence': array('f', bytes(4 * args.students)),
+        'first_day': array('I', bytes(4 * args.students)),
+        'last_day': array('I', bytes(4 * args.students)),
+        'last_name': array('H', bytes(2 * args.students)),
+        'parent_first': array('I', bytes(4 * args.students)),
+        'parent_count': bytearray(args.students),
+    }
+    # Siblings are looked up at most SIBLING_WINDOW students back, so only
+    # that many addresses are kept
+    recent_addresses = [None] * SIBLING_WINDOW
+
+    for index in range(args.students):
+        student_id = first_student_id + index
+        grade = GRADES[bisect_right(GRADE_CUM_WEIGHTS, rng.random() * GRADE_CUM_WEIGHTS[-1])]
+        r = rng.random()
+        gender = 'Male' if r < 0.49 else 'Female' if r < 0.98 else 'Other'
+        first_name = rng.choice(FIRST_NAMES[gender if gender != 'Other' else rng.choice(('Male', 'Female'))])
+
+        # About one student in six has an older or younger sibling already enrolled
+        sibling = index - rng.randint(1, SIBLING_WINDOW) if index and rng.random() < 0.15 else None
+        if sibling is not None and sibling >= 0:
+            last_name_index = traits['last_name'][sibling]
+            address = recent_addresses[sibling % SIBLING_WINDOW]
+        else:
+            sibling = None
+            last_name_index = rng.randrange(len(LAST_NAMES))
+            address = f"{rng.randint(1, 999)}, {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+        last_name = LAST_NAMES[last_name_index]
+
+        # Age matches the grade, give or take half a year
+        date_of_birth = date(first_day.year - grade - 5, 6, 1) + timedelta(days=rng.randint(-180, 180))
+        total_fee = 20000 + 2500 * grade + rng.choice((0, 0, 0, 2500, 5000))
+
+        # Most students joined in an earlier year; a few mid-period
+        if rng.random() < 0.03:
+            start_index = rng.randrange(len(days))
+            enrollment_date = at_time(days[start_index], rng)
+        else:
+            start_index = 0
+            years_back = rng.randint(0, grade - 1)
+            enrollment_date = at_time(date(first_day.year - years_back, first_day.month, 1)
+                                      - timedelta(days=rng.randint(0, 20)), rng)
+        if rng.random() < 0.04:
+            status = 'deactive'
+            end_index = rng.randint(start_index, len(days) - 1)
+        else:
+            status = 'active'
+            end_index = len(days)
+
+        # Parents: siblings share them, otherwise one or two new ones
+        if sibling is not None:
+            parent_first, parent_count = traits['parent_first'][sibling], traits['parent_count'][sibling]
+        else:
+            parent_first = next_parent_id
+            r = rng.random()
+            relationships = (('father', 'mother') if r < 0.85 else ('mother',) if r < 0.93
+                             else ('father',) if r < 0.97 else ('guardian',))
+            for relationship in relationships:
+                parent_gender = 'Female' if relationship == 'mother' else 'Male'
+                parent_last = last_name if relationship != 'guardian' else rng.choice(LAST_NAMES)
+                parent_first_name = rng.choice(FIRST_NAMES[parent_gender])
+                parents.add((next_parent_id, f"{parent_first_name} {parent_last}", relationship,
+                             f"{rng.randint(6, 9)}{rng.randrange(10 ** 9):09d}",
+                             f"{parent_first_name}.{parent_last}{next_parent_id}@mail.example".lower() if rng.random() < 0.8 else None,
+                             address, rng.choice(OCCUPATIONS)))
+                next_parent_id += 1
+            parent_count = len(relationships)
+        for parent_id in range(parent_first, parent_first + parent_count):
+            links.add((student_id, parent_id))
+
+        # Fees: one to four installments; about one student in five falls behind
+        r = fee_rng.random()
+        installments = 1 if r < 0.45 else 2 if r < 0.75 else 3 if r < 0.9 else 4
+        target = total_fee if fee_rng.random() < 0.8 else round(total_fee * fee_rng.uniform(0.3, 0.9), -2)
+        last_payable = min(end_index, len(days)) - 1
+        paid = 0
+        for installment in range(installments):
+            if paid >= target or start_index > last_payable:
+                break
+            span = (last_payable - start_index) // installments
+            day_index = start_index + installment * span + fee_rng.randint(0, max(span - 1, 0))
+            amount = target - paid if installment == installments - 1 else round(target / installments, -2)
+            amount = min(amount, target - paid)
+            paid += amount
+            fees.add((student_id, at_time(days[min(day_index, last_payable)], fee_rng, 9, 17),
+                      'completed' if paid >= total_fee else 'pending', Decimal(amount).quantize(Decimal('0.01')),
+                      Decimal(total_fee).quantize(Decimal('0.01')), f"Installment {installment + 1}",
+                      'online' if fee_rng.random() < 0.55 else 'cash'))
+
+        students.add((student_id, f"{first_name} {last_name}", date_of_birth, gender,
+                      f"{first_name}.{last_name}{student_id}@student.example".lower(),
+                      f"{rng.randint(6, 9)}{rng.randrange(10 ** 9):09d}", address,
+                      'completed' if paid >= total_fee else 'pending', total_fee, str(grade), status,
+                      enrollment_date))
+
+        traits['grade'][index] = grade
+        traits['ability'][index] = rng.gauss(0, 1)
+        # Absence rate rises a little with grade and varies a lot between students
+        traits['absence'][index] = min(0.5, (0.035 + 0.003 * grade) * rng.lognormvariate(0, 0.6))
+        traits['first_day'][index] = start_index
+        traits['last_day'][index] = end_index
+        traits['last_name'][index] = last_name_index
+        traits['parent_first'][index] = parent_first
+        traits['parent_count'][index] = parent_count
+        recent_addresses[index % SIBLING_WINDOW] = address
+
+    students.close()
+    parents.close()
+    links.close()
+    fees.close()
+    return first_student_id, traits
+
+
+def generate_attendance(args, connection, days, first_student_id, traits, teachers_by_grade, seed):
+    rng = random.Random(f"{seed}:attendance")
+    loader = TableLoader(connection, 'attendance', ('student_id', 'date', 'status', 'remarks', 'marked_by'),
+                         args.method, args.batch_size)
+    grades, absence = traits['grade'], traits['absence']
+    first_days, last_days = traits['first_day'], traits['last_day']
+    markers = {grade: teachers[0] for grade, teachers in teachers_by_grade.items()}
+    late_rate = 0.03
+    for day_index, day in enumerate(days):
+        # The odd bad-weather or flu day doubles absences
+        day_factor = 2.0 if rng.random() < 0.03 else 1.0
+        for index in range(args.students):
+            if day_index < first_days[index] or day_index >= last_days[index]:
+                continue
+            r = rng.random()
+            p = absence[index] * day_factor
+            if r < p:
+                status, remarks = 'absent', None
+            elif r < p + late_rate:
+                status, remarks = 'late', 'Late arrival'
+            else:
+                status, remarks = 'present', None
+            loader.add((first_student_id + index, day, status, remarks, markers[grades[index]]))
+    loader.close()
+
+
+def generate_results(args, connection, exams, subjects_by_grade, first_student_id, traits, seed):
+    rng = random.Random(f"{seed}:results")
+    loader = TableLoader(connection, 'exam_results', ('exam_id', 'student_id', 'subject_id', 'marks_obtained',
+                                                      'total_marks', 'grade', 'remarks'),
+                         args.method, args.batch_size)
+    total_marks = Decimal('100.00')
+    for exam_id, end_index in exams:
+        for index in range(args.students):
+            if end_index < traits['first_day'][index] or end_index >= traits['last_day'][index]:
+                continue
+            grade = traits['grade'][index]
+            ability = traits['ability'][index]
+            for subject_id, difficulty in subjects_by_grade[grade]:
+                mean = 68 + 12 * ability - difficulty - 0.6 * grade
+                marks = min(100.0, max(0.0, round(rng.gauss(mean, 9) * 2) / 2))
+                letter = result_grade(marks)
+                loader.add((exam_id, first_student_id + index, subject_id, Decimal(str(marks)).quantize(Decimal('0.01')),
+                            total_marks, letter, 'Needs improvement' if letter == 'F' else None))
+    loader.close()
+
+
+def generate_notifications(args, cursor, connection, days, first_student_id, traits, teacher_ids, seed):
+    rng = random.Random(f"{seed}:notifications")
+    first_message_id = next_id(cursor, 'notification_messages', 'message_id')
+    messages = TableLoader(connection, 'notification_messages', ('message_id', 'title', 'message', 'type',
+                                                                 'created_at'), args.method, args.batch_size)
+    recipients = TableLoader(connection, 'notification_recipients', ('message_id', 'recipient_type',
+                                                                     'recipient_id', 'is_read', 'read_at'),
+                             args.method, args.batch_size)
+    by_grade = {grade: array('I') for grade in GRADES}
+    for index, grade in enumerate(traits['grade']):
+        by_grade[grade].append(index)
+    last_day = days[-1]
+    # Timestamps are drawn up front and sorted so message and notification ids
+    # follow created_at, as they do when the app inserts them
+    created = sorted(at_time(days[rng.randrange(len(days))], rng) for _ in range(args.notifications))
+
+    for offset, created_at in enumerate(created):
+        message_id = first_message_id + offset
+        day = created_at.date()
+        title, body, notif_type = rng.choice(NOTIFICATION_TEMPLATES)
+
+        # Audience: mostly whole grades, some single students, a few school-wide or staff notices
+        r = rng.random()
+        grade = rng.choice(GRADES)
+        if r < 0.02:
+            audience, include_parents = range(args.students), True
+            body = body.replace(' for grade {grade}', '').replace('grade {grade}', 'all grades')
+        elif r < 0.07:
+            audience, include_parents = (), False
+        elif r < 0.6:
+            audience, include_parents = by_grade[grade], rng.random() < 0.7
+        else:
+            audience, include_parents = (rng.randrange(args.students),) if args.students else (), True
+            if audience:
+                grade = traits['grade'][audience[0]]
+        messages.add((message_id, title, body.format(grade=grade), notif_type, created_at))
+
+        # Older notifications are more likely to have been read
+        age = (last_day - day).days
+        read_rate = 0.95 if age > 30 else 0.6 if age > 7 else 0.3
+
+        def add_recipient(recipient_type, recipient_id):
+            is_read = rng.random() < read_rate
+            read_at = created_at + timedelta(minutes=rng.randint(1, 60 * 24 * 3)) if is_read else None
+            recipients.add((message_id, recipient_type, recipient_id, int(is_read), read_at))
+
+        if r >= 0.02 and r < 0.07:
+            for user_id in teacher_ids:
+                add_recipient('user', user_id)
+        seen_parents = set()
+        for index in audience:
+            add_recipient('student', first_student_id + index)
+            if include_parents:
+                parent_first = traits['parent_first'][index]
+                for parent_id in range(parent_first, parent_first + traits['parent_count'][index]):
+                    # siblings in the same audience share parents
+                    if parent_id not in seen_parents:
+                        seen_parents.add(parent_id)
+                        add_recipient('parent', parent_id)
+    messages.close()
+    recipients.close()
+
+
+def rebuild_derived(cursor, connection, first_student_id):
+    # Same results as the send/record endpoints would have maintained
+    started = time.perf_counter()
+    cursor.execute("""
+        INSERT INTO student_fee_balances (student_id, total_paid)
+        SELECT s.student_id, COALESCE(SUM(sf.amount_paid), 0)
+        FROM students s
+        LEFT JOIN student_fees sf ON sf.student_id = s.student_id
+        WHERE s.student_id >= %s
+        GROUP BY s.student_id
+        ON DUPLICATE KEY UPDATE total_paid = VALUES(total_paid)
+    """, (first_student_id,))
+    connection.commit()
+    print(f"  {'student_fee_balances':<26} {cursor.rowcount:>12,} rows  {time.perf_counter() - started:8.1f}s")
+
+    started = time.perf_counter()
+    cursor.execute("""
+        INSERT INTO notification_unread_counts (recipient_type, recipient_id, unread_count)
+        SELECT recipient_type, recipient_id, COUNT(*)
+        FROM notification_recipients
+        WHERE is_read = 0
+        GROUP BY recipient_type, recipient_id
+        ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count)
+    """)
+    connection.commit()
+    print(f"  {'notification_unread_counts':<26} {cursor.rowcount:>12,} rows  {time.perf_counter() - started:8.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a realistic student management data set")
+    parser.add_argument('--students', type=int, default=10_000)
+    parser.add_argument('--school-days', type=int, default=180, help="attendance days (weekdays)")
+    parser.add_argument('--start-date', type=date.fromisoformat, help="first school day, YYYY-MM-DD")
+    parser.add_argument('--exams', type=int, default=4)
+    parser.add_argument('--notifications', type=int, default=500, help="notification messages")
+    parser.add_argument('--teachers', type=int, default=50)
+    parser.add_argument('--seed', default='42')
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert')
+    parser.add_argument('--batch-size', type=int, default=5000, help="rows per INSERT statement")
+    parser.add_argument('--reset', action='store_true', help="empty the generated tables first")
+    args = parser.parse_args()
+
+    start_date = args.start_date or default_start_date(args.school_days)
+    days = school_days(start_date, args.school_days)
+    print(f"{args.students:,} students, {len(days)} school days from {days[0]} to {days[-1]}, seed {args.seed}")
+
+    connection = create_unpooled_connection(allow_local_infile=args.method == 'load-data', autocommit=False)
+    cursor = connection.cursor()
+    # Bulk load settings for this session only; every row is generated consistent
+    cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+    if args.reset:
+        for table in GENERATED_TABLES:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("DELETE FROM users WHERE username LIKE 'teacher%' AND email LIKE '%@school.example'")
+        connection.commit()
+
+    started = time.perf_counter()
+    teachers_by_grade, teacher_ids = generate_users(args, cursor, connection, random.Random(f"{args.seed}:users"))
+    subjects_by_grade = generate_subjects(cursor, connection)
+    exams = generate_exams(args, cursor, connection, days)
+    first_student_id, traits = generate_students(args, cursor, connection, days, args.seed)
+    generate_attendance(args, connection, days, first_student_id, traits, teachers_by_grade, args.seed)
+    generate_results(args, connection, exams, subjects_by_grade, first_student_id, traits, args.seed)
+    generate_notifications(args, cursor, connection, days, first_student_id, traits, teacher_ids, args.seed)
+    rebuild_derived(cursor, connection, first_student_id)
+
+    cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+    # Fresh index statistics so EXPLAIN reflects the new volume
+    cursor.execute(f"ANALYZE TABLE {', '.join(GENERATED_TABLES)}")
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
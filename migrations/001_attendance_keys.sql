@@ -0,0 +1,20 @@
+-- Attendance keys
+--
+-- One attendance row per student per day, so ON DUPLICATE KEY UPDATE in
+-- /mark_attendance and /bulk_attendance actually upserts, plus a (date, status)
+-- key for the dashboard's daily summary.
+
+-- Keep only the latest row for any (student_id, date) pair marked twice
+DELETE a_old
+FROM attendance a_old
+JOIN attendance a_new
+  ON a_new.student_id = a_old.student_id
+ AND a_new.date = a_old.date
+ AND a_new.attendance_id > a_old.attendance_id;
+
+ALTER TABLE `attendance`
+  ADD UNIQUE KEY `uq_attendance_student_date` (`student_id`, `date`),
+  ADD KEY `idx_attendance_date_status` (`date`, `status`);
+
+-- The composite key now backs the student_id foreign key
+ALTER TABLE `attendance` DROP KEY `student_id`;
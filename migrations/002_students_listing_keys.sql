@@ -0,0 +1,9 @@
+-- Students listing keys
+--
+-- Let GET /get_students walk filtered pages as index range scans
+-- (WHERE grade = ? AND student_id > ? ORDER BY student_id LIMIT n). The
+-- fee_status key also serves the dashboard's pending fee count.
+
+ALTER TABLE `students`
+  ADD KEY `idx_students_grade` (`grade`, `student_id`),
+  ADD KEY `idx_students_fee_status` (`fee_status`, `student_id`);
@@ -0,0 +1,21 @@
+-- Student search index
+--
+-- FULLTEXT over name, email and phone with the ngram parser (default
+-- ngram_token_size = 2) so /search_student/search matches substrings of any
+-- of the three columns without a table scan. InnoDB keeps the index current
+-- on every insert, update and delete. The plain full_name key serves the
+-- single-character prefix fallback.
+--
+-- The ngram parser drops every token that contains a stopword, and the
+-- default InnoDB list has single letters such as "a", "i" and "o", so most
+-- two-character tokens of names and emails would be missing. The stopword
+-- setting is taken when the index is created, so it is turned off for this
+-- session first.
+
+SET SESSION innodb_ft_enable_stopword = OFF;
+
+ALTER TABLE `students`
+  ADD FULLTEXT KEY `ft_students_search` (`full_name`, `email`, `phone`) WITH PARSER ngram;
+
+ALTER TABLE `students`
+  ADD KEY `idx_students_full_name` (`full_name`);
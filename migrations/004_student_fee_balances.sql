@@ -0,0 +1,20 @@
+-- Running fee balance per student
+--
+-- /record_payment adds each payment to total_paid in the same transaction as
+-- the student_fees insert, so /fee_dues reads the balance with one primary key
+-- lookup instead of summing the payment history. POST /reconcile_fee_balances
+-- (or `flask reconcile-fee-balances`) rebuilds it from student_fees.
+
+CREATE TABLE `student_fee_balances` (
+  `student_id` int NOT NULL,
+  `total_paid` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`student_id`),
+  CONSTRAINT `student_fee_balances_ibfk_1` FOREIGN KEY (`student_id`) REFERENCES `students` (`student_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT INTO student_fee_balances (student_id, total_paid)
+SELECT s.student_id, COALESCE(SUM(sf.amount_paid), 0)
+FROM students s
+LEFT JOIN student_fees sf ON sf.student_id = s.student_id
+GROUP BY s.student_id;
@@ -0,0 +1,7 @@
+-- Fee collection report key
+--
+-- Covers the date-range filter and the per-method totals of /fee_collection,
+-- so the report reads only the index entries in the requested range.
+
+ALTER TABLE `student_fees`
+  ADD KEY `idx_student_fees_payment_date` (`payment_date`, `payment_method`, `amount_paid`);
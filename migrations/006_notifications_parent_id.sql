@@ -0,0 +1,8 @@
+-- Parent recipients for notifications
+--
+-- Lets /api/notifications/bulk address parents linked through student_parent.
+
+ALTER TABLE `notifications`
+  ADD COLUMN `parent_id` int DEFAULT NULL AFTER `student_id`,
+  ADD KEY `parent_id` (`parent_id`),
+  ADD CONSTRAINT `notifications_ibfk_3` FOREIGN KEY (`parent_id`) REFERENCES `parents` (`parent_id`);
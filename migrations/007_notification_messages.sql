@@ -0,0 +1,79 @@
+-- Normalised notification storage
+--
+-- A notification's title and body are stored once in notification_messages;
+-- each recipient gets a narrow fixed-width row in notification_recipients.
+-- recipient_type/recipient_id address users, students or parents, so there is
+-- no foreign key on recipient_id.
+
+CREATE TABLE `notification_messages` (
+  `message_id` int NOT NULL AUTO_INCREMENT,
+  `title` varchar(100) NOT NULL,
+  `message` text NOT NULL,
+  `type` enum('info','warning','alert') DEFAULT 'info',
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`message_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE `notification_recipients` (
+  `notification_id` int NOT NULL AUTO_INCREMENT,
+  `message_id` int NOT NULL,
+  `recipient_type` enum('user','student','parent') NOT NULL,
+  `recipient_id` int NOT NULL,
+  `is_read` tinyint(1) NOT NULL DEFAULT '0',
+  `read_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`notification_id`),
+  UNIQUE KEY `uq_notification_recipient` (`message_id`, `recipient_type`, `recipient_id`),
+  KEY `idx_notification_recipients_inbox` (`recipient_type`, `recipient_id`, `notification_id`),
+  CONSTRAINT `notification_recipients_ibfk_1` FOREIGN KEY (`message_id`) REFERENCES `notification_messages` (`message_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rows written by one bulk send share title, message, type and created_at;
+-- collapse each such group into a single message. A regular (not TEMPORARY)
+-- table, since MySQL cannot open a temporary table twice in one statement
+CREATE TABLE `notification_message_map` AS
+SELECT n.notification_id, grouped.message_id
+FROM notifications n
+JOIN (
+  SELECT MIN(notification_id) AS message_id, title, message, type, created_at
+  FROM notifications
+  GROUP BY title, message, type, created_at
+) grouped
+  ON grouped.title = n.title
+ AND grouped.message = n.message
+ AND grouped.type <=> n.type
+ AND grouped.created_at <=> n.created_at;
+
+INSERT INTO notification_messages (message_id, title, message, type, created_at)
+SELECT n.notification_id, n.title, n.message, n.type, n.created_at
+FROM notifications n
+JOIN notification_message_map map ON map.notification_id = n.notification_id
+WHERE map.message_id = n.notification_id
+ORDER BY n.created_at, n.notification_id;
+
+-- One statement for all three recipient columns, ordered so the new
+-- notification_ids (which the inbox pages by) follow creation order
+INSERT IGNORE INTO notification_recipients (message_id, recipient_type, recipient_id, is_read)
+SELECT fanout.message_id, fanout.recipient_type, fanout.recipient_id, fanout.is_read
+FROM (
+  SELECT map.message_id, 'user' AS recipient_type, n.user_id AS recipient_id, COALESCE(n.is_read, 0) AS is_read,
+         n.created_at, n.notification_id
+  FROM notifications n
+  JOIN notification_message_map map ON map.notification_id = n.notification_id
+  WHERE n.user_id IS NOT NULL
+  UNION ALL
+  SELECT map.message_id, 'student', n.student_id, COALESCE(n.is_read, 0), n.created_at, n.notification_id
+  FROM notifications n
+  JOIN notification_message_map map ON map.notification_id = n.notification_id
+  WHERE n.student_id IS NOT NULL
+  UNION ALL
+  SELECT map.message_id, 'parent', n.parent_id, COALESCE(n.is_read, 0), n.created_at, n.notification_id
+  FROM notifications n
+  JOIN notification_message_map map ON map.notification_id = n.notification_id
+  WHERE n.parent_id IS NOT NULL
+) fanout
+ORDER BY fanout.created_at, fanout.notification_id, fanout.recipient_type;
+
+DROP TABLE `notification_message_map`;
+
+-- Kept for reference; nothing reads it any more
+RENAME TABLE `notifications` TO `notifications_legacy`;
@@ -0,0 +1,22 @@
+-- Notification inbox keys and unread counters
+--
+-- The inbox is paged per recipient on notification_id (insertion order, i.e.
+-- newest first by created_at); the unread key serves ?unread_only=1 and bulk
+-- mark-as-read. notification_unread_counts is maintained by the send and
+-- mark-as-read endpoints so the badge count is a primary key lookup.
+
+ALTER TABLE `notification_recipients`
+  ADD KEY `idx_notification_recipients_unread` (`recipient_type`, `recipient_id`, `is_read`, `notification_id`);
+
+CREATE TABLE `notification_unread_counts` (
+  `recipient_type` enum('user','student','parent') NOT NULL,
+  `recipient_id` int NOT NULL,
+  `unread_count` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`recipient_type`, `recipient_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT INTO notification_unread_counts (recipient_type, recipient_id, unread_count)
+SELECT recipient_type, recipient_id, COUNT(*)
+FROM notification_recipients
+WHERE is_read = 0
+GROUP BY recipient_type, recipient_id;
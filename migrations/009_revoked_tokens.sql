@@ -0,0 +1,12 @@
+-- Revoked JWTs
+--
+-- /logout records the token's jti here; every worker reloads the unexpired
+-- ids into memory every REVOCATION_REFRESH_INTERVAL seconds. Rows past
+-- expires_at can be deleted at any time.
+
+CREATE TABLE `revoked_tokens` (
+  `jti` varchar(64) NOT NULL,
+  `expires_at` datetime NOT NULL,
+  PRIMARY KEY (`jti`),
+  KEY `idx_revoked_tokens_expires_at` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
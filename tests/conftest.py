@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The API modules import each other as top-level modules (run from API/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'API'))
+os.environ.setdefault('JWT_AUTH_ENABLED', 'false')
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
@@ -0,0 +1,54 @@
+import app as app_module
+
+
+class FakeCursor:
+    def __init__(self):
+        self.inserted = []
+        self._ids = []
+
+    def execute(self, query, params):
+        if query.lstrip().startswith('SELECT'):
+            self._ids = [(student_id,) for student_id in params]
+        else:
+            self.inserted.extend(params[i:i + 4] for i in range(0, len(params), 4))
+
+    def fetchall(self):
+        return self._ids
+
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_non_string_remarks_fail_only_their_row(client, monkeypatch):
+    cursor = FakeCursor()
+    monkeypatch.setattr(app_module, 'get_db', lambda: FakeConnection())
+    monkeypatch.setattr(app_module, 'get_cursor', lambda: cursor)
+    monkeypatch.setattr(app_module, 'invalidate_dashboard_statistics', lambda: None)
+
+    response = client.post('/bulk_attendance', json={
+        'date': '2024-03-01',
+        'grade': '5',
+        'attendance_data': [
+            {'student_id': 1, 'status': 'present', 'remarks': 'on time'},
+            {'student_id': 2, 'status': 'absent', 'remarks': {}},
+            {'student_id': 3, 'status': 'late', 'remarks': ['bus']},
+            {'student_id': 4, 'status': 'present'},
+        ]
+    })
+
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()['data']
+    assert data['marked_count'] == 2
+    assert [(f['index'], f['error']) for f in data['failed']] == [
+        (1, 'remarks must be a string'), (2, 'remarks must be a string')]
+    assert [row[0] for row in cursor.inserted] == [1, 4]
+
+
+def test_non_object_body_is_rejected(client):
+    response = client.post('/bulk_attendance', json=[1, 2])
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+import io
+
+import auth
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.lastrowid = None
+        self._next_id = 100
+
+    def execute(self, query, params):
+        rows = len(params) // len(auth.USER_FIELDS)
+        self.statements.append(rows)
+        # MySQL reports the first id of a multi-row insert
+        self.lastrowid = self._next_id
+        self._next_id += rows + 5  # ids of later statements need not be contiguous
+
+
+class FakeConnection:
+    committed = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def test_bulk_users_ids_across_chunks(client, monkeypatch):
+    cursor = FakeCursor()
+    connection = FakeConnection()
+    monkeypatch.setattr(auth, 'BULK_USERS_CHUNK_SIZE', 2)
+    monkeypatch.setattr(auth, 'get_db', lambda: connection)
+    monkeypatch.setattr(auth, 'get_cursor', lambda: cursor)
+    monkeypatch.setattr(auth, 'hash_passwords', lambda passwords: [f'hash-{p}' for p in passwords])
+
+    lines = ['username,password,email,full_name,role']
+    lines += [f'user{i},pw{i},user{i}@example.com,User {i},staff' for i in range(5)]
+    upload = (io.BytesIO('\n'.join(lines).encode()), 'users.csv')
+    response = client.post('/register/bulk', data={'file': upload}, content_type='multipart/form-data')
+
+    assert response.status_code == 200, response.get_json()
+    assert cursor.statements == [2, 2, 1]
+    assert connection.committed
+    assert response.get_json()['data'] == [
+        {'user_id': 100, 'username': 'user0'},
+        {'user_id': 101, 'username': 'user1'},
+        {'user_id': 107, 'username': 'user2'},
+        {'user_id': 108, 'username': 'user3'},
+        {'user_id': 114, 'username': 'user4'},
+    ]
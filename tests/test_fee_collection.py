@@ -0,0 +1,27 @@
+import pytest
+
+DATES = 'start_date=2024-01-01&end_date=2024-01-31'
+
+
+@pytest.mark.parametrize('path', ['/fee_collection', '/fee_collection/transactions'])
+@pytest.mark.parametrize('limit', ['0', '-3'])
+def test_non_positive_limit_is_rejected(client, path, limit):
+    response = client.get(f'{path}?{DATES}&limit={limit}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'limit must be positive'
+
+
+def test_bad_pagination_is_not_reported_as_bad_dates(client):
+    response = client.get(f'/fee_collection/transactions?{DATES}&after=abc')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'limit and after must be integers'
+
+    response = client.get(f'/fee_collection?{DATES}&limit=ten')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'limit must be an integer'
+
+
+def test_missing_dates(client):
+    response = client.get('/fee_collection/transactions?limit=10')
+    assert response.status_code == 400
+    assert 'start_date' in response.get_json()['message']
@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.mark.parametrize('limit', ['0', '-5'])
+def test_get_notifications_rejects_non_positive_limit(client, limit):
+    response = client.get(f'/api/notifications?user_id=1&limit={limit}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'limit must be positive'
+
+
+def test_get_notifications_rejects_non_integer_limit(client):
+    response = client.get('/api/notifications?user_id=1&limit=ten')
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import passwords
+
+
+@pytest.fixture(autouse=True)
+def fast_hashes(monkeypatch):
+    monkeypatch.setattr(passwords, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+
+def test_pool_is_replaced_after_a_child_dies():
+    future = passwords._submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        future.result(passwords.PASSWORD_HASH_TIMEOUT)
+
+    restarts = passwords.stats['restarts']
+    pwhash = passwords.hash_password('secret')
+    assert passwords.verify_password(pwhash, 'secret')
+    assert passwords.stats['restarts'] == restarts + 1
+
+
+def test_hash_timeout_is_reported_as_overload(monkeypatch):
+    monkeypatch.setattr(passwords, 'PASSWORD_HASH_TIMEOUT', 0.01)
+    with pytest.raises(passwords.HashQueueFull):
+        passwords._call(time.sleep, 1)
@@ -0,0 +1,24 @@
+import os
+import time
+
+from slow_queries import SlowQueryLog
+
+
+def _wait_for_plan(entry, timeout=2):
+    deadline = time.monotonic() + timeout
+    while entry['plan'] is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return entry['plan']
+
+
+def test_explainer_runs_in_a_worker_forked_after_it_started():
+    log = SlowQueryLog(threshold_ms=0, size=10)
+    log._explain = lambda operation, params: [{'table': 'students'}]
+    assert _wait_for_plan(log.record("SELECT 1", None, 5)) is not None
+
+    pid = os.fork()
+    if pid == 0:
+        entry = log.record("SELECT * FROM students WHERE student_id = %s", (1,), 5)
+        os._exit(0 if _wait_for_plan(entry) == [{'table': 'students'}] else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0